@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 import os
 
@@ -10,3 +11,28 @@ app = Celery("ABSAapi")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+
+@worker_init.connect
+def preload_models(**kwargs) -> None:
+    # worker master process, before the pool forks (ABSA_SHARED_WEIGHTS).
+    # The pool processes inherit its runtime, so it is the worker one and not
+    # the "management" default a load would otherwise apply.
+    from django.conf import settings
+
+    from analyzer.registry import preload
+    from analyzer.runtime import configure_runtime
+
+    if getattr(settings, "ABSA_SHARED_WEIGHTS", {}).get("PRELOAD"):
+        configure_runtime("celery")
+    preload()
+
+
+@worker_process_init.connect
+def load_models(**kwargs) -> None:
+    # worker (pool) processes only, beat never loads the AI models
+    from analyzer.registry import warm_up
+    from analyzer.runtime import configure_runtime
+
+    configure_runtime("celery")
+    warm_up()
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'analyzer.profiling.stage_timing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -142,6 +143,163 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
 
+# --- ABSA INFERENCE CONFIGURATION ---
+ABSA_MODEL_PATH = BASE_DIR / "model" / "absa_bert_model"
+# spaCy pipeline (name or path) for aspect extraction. It is never downloaded
+# at runtime: python -m spacy download en_core_web_sm when building the image
+ABSA_SPACY_MODEL = "en_core_web_sm"
+# When server processes (wsgi, asgi, celery workers) load the models:
+# "background" (thread started at boot, /readyz turns 200 once done), "eager"
+# (block until loaded) or "lazy" (first request). Management commands and
+# celery beat only load them on first use.
+ABSA_MODEL_LOADING = "background"
+# Share the model between forked workers instead of one copy per process.
+# PRELOAD loads it in the master (run gunicorn with --preload; celery prefork
+# loads it before the pool forks), CPU only. MMAP keeps the fp32 weights
+# backed by model.safetensors (page cache) instead of private memory.
+# GC_FREEZE keeps the workers' garbage collector off the preloaded objects.
+ABSA_SHARED_WEIGHTS = {
+    "PRELOAD": False,
+    "MMAP": False,
+    "GC_FREEZE": True,
+}
+# Inference backend: "torch" (eager), "onnx" (onnxruntime CPU) or "torchscript".
+# Exported graphs are created with `python manage.py export_model`.
+ABSA_INFERENCE_BACKEND = "torch"
+ABSA_ONNX_MODEL_PATH = BASE_DIR / "model" / "absa_bert_model.onnx"
+ABSA_TORCHSCRIPT_MODEL_PATH = BASE_DIR / "model" / "absa_bert_model.pt"
+ABSA_ONNX_THREADS = {"INTRA_OP": 0, "INTER_OP": 1}  # 0 = onnxruntime default
+# int8 CPU serving for the torch backend: None (fp32), "dynamic" (quantize the
+# Linear layers at load time) or "artifact" (load `manage.py quantize_model` output)
+ABSA_QUANTIZATION = None
+ABSA_QUANTIZED_MODEL_PATH = BASE_DIR / "model" / "absa_bert_model.int8.pt"
+# Tokenization: batches are padded to their longest pair, capped at
+# ABSA_MAX_SEQ_LENGTH tokens. Longer pairs are truncated ("truncate") or, in
+# "window" mode, classified on the sentences around the aspect mention only
+# (ABSA_SENTENCE_WINDOW sentences on each side).
+ABSA_MAX_SEQ_LENGTH = 128
+ABSA_LONG_TEXT_MODE = "window"
+ABSA_SENTENCE_WINDOW = 1
+# Texts longer than this (cleaned characters) are treated as documents: each
+# aspect is classified against the spaCy sentences mentioning it and the
+# probabilities are averaged per aspect. None disables it.
+ABSA_LONG_DOCUMENT_CHARS = 1000
+# Max number of (text, aspect) pairs sent through BERT in one forward pass
+ABSA_MAX_BATCH_SIZE = 32
+# Bulk CSV jobs: rows analyzed together, and the batch limits of their pairs
+ABSA_BULK_CHUNK_ROWS = 512
+ABSA_BULK_MAX_BATCH_SIZE = 256
+ABSA_BULK_TOKEN_BUDGET = 8192  # padded tokens (batch size x longest pair)
+# Bulk tasks are delivered again when their worker dies (acks_late) and resume
+# from their checkpoint; a session or shard whose task was delivered this many
+# times (retries after errors included) is failed instead of run again, so a
+# row that kills the worker (OOM, segfault) cannot loop forever
+ABSA_BULK_MAX_ATTEMPTS = 5
+# Uploads of at least 2 x SHARD_BYTES are split into byte-range shards, each
+# processed by its own Celery task (a chord callback finalizes the session);
+# a failed shard is retried on its own up to MAX_RETRIES times
+ABSA_SHARDING = {
+    "ENABLED": True,
+    "SHARD_BYTES": 8 * 1024 * 1024,
+    "MAX_RETRIES": 3,
+    "RETRY_DELAY": 10,  # seconds
+}
+# spaCy nlp.pipe for bulk aspect extraction. n_process > 1 forks workers, which
+# needs a non-daemonic Celery pool (e.g. --pool=solo or --pool=threads)
+ABSA_SPACY_BATCH_SIZE = 64
+ABSA_SPACY_N_PROCESS = 1
+# Records (and their aspects) written per bulk_create transaction
+ABSA_DB_BATCH_SIZE = 500
+# Whole-text result cache keyed by cleaned text + model fingerprint.
+# BACKEND: "lru" (per process), "django" (CACHES[CACHE_ALIAS], e.g. Redis) or None
+ABSA_RESULT_CACHE = {
+    "BACKEND": "lru",
+    "MAX_ENTRIES": 10000,
+    "TIMEOUT": 60 * 60,  # seconds, None never expires
+    "CACHE_ALIAS": "default",
+}
+# Per-process memo of BERT logits per tokenized (text, aspect) pair
+ABSA_PAIR_MEMO = {
+    "ENABLED": True,
+    "MAX_BYTES": 64 * 1024 * 1024,
+}
+# Cross-request batching for the sync text endpoint: pairs of concurrent
+# requests are flushed as one forward pass at MAX_BATCH_SIZE pairs or after
+# MAX_WAIT_MS; requests beyond MAX_QUEUE_DEPTH get a 503. A request whose
+# result takes longer than RESULT_TIMEOUT seconds fails instead of waiting on.
+ABSA_BATCHING = {
+    "ENABLED": False,
+    "MAX_BATCH_SIZE": 64,
+    "MAX_WAIT_MS": 5,
+    "MAX_QUEUE_DEPTH": 1024,
+    "RESULT_TIMEOUT": 30.0,
+}
+# Bulk session progress: the session row is written at most every
+# DB_INTERVAL seconds. With CACHE_ALIAS (a CACHES alias shared by the web and
+# Celery processes, e.g. Redis) every chunk also updates a live counter that
+# GET /api/sessions/{id}/ and /api/sessions/{id}/progress/ read.
+ABSA_PROGRESS = {
+    "DB_INTERVAL": 2.0,
+    "CACHE_ALIAS": None,
+    "CACHE_TIMEOUT": 24 * 60 * 60,
+}
+# Stage timings (clean, parse, aspects, inference, tokenize, forward,
+# aggregate, db_write) of SAMPLE_RATE of the requests and bulk chunks, as
+# histograms on GET /metrics (Prometheus). Without CACHE_ALIAS every process
+# reports its own; with a shared CACHES alias (e.g. Redis) the web and Celery
+# processes add up into one set. SERVER_TIMING adds a Server-Timing header to
+# sampled responses.
+ABSA_PROFILING = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 0.1,
+    "SERVER_TIMING": False,
+    "CACHE_ALIAS": None,
+    "BUCKETS": None,  # seconds, None for profiling.DEFAULT_BUCKETS
+}
+# JSON text batches (POST /api/sessions/ with "texts"): at most MAX_TEXTS per
+# request of at most MAX_TEXT_CHARS characters each; up to SYNC_MAX_TEXTS are
+# analyzed within the request and returned, larger batches are sent to Celery
+# (the texts travel in the task message, so the two limits bound its size).
+ABSA_TEXT_BATCH = {
+    "MAX_TEXTS": 5000,
+    "MAX_TEXT_CHARS": 2000,
+    "SYNC_MAX_TEXTS": 32,
+}
+# Streaming result export (GET /api/sessions/{id}/export/<csv|ndjson|parquet>/):
+# rows fetched from the DB cursor and written out per CHUNK_SIZE. Parquet
+# needs pyarrow.
+ABSA_EXPORT = {
+    "CHUNK_SIZE": 2000,
+}
+# Threads running blocking inference for the async (ASGI) text endpoint
+ABSA_ASYNC_EXECUTOR_WORKERS = 4
+# Inference threads per process role, applied when the process starts:
+# "web" (wsgi/asgi workers), "celery" (worker pool processes) and
+# "management" (manage.py commands). Size INTRA_OP x number of workers to the
+# cores of the node; None keeps torch's default of one thread per core.
+# PIN_CORES pins every process to INTRA_OP cores of its own (Linux).
+# Compare settings with: python manage.py benchmark_threads
+ABSA_RUNTIME = {
+    "web": {
+        "INTRA_OP": 1,
+        "INTER_OP": 1,
+        "TOKENIZERS_PARALLELISM": False,
+        "PIN_CORES": False,
+    },
+    "celery": {
+        "INTRA_OP": 4,
+        "INTER_OP": 1,
+        "TOKENIZERS_PARALLELISM": False,
+        "PIN_CORES": False,
+    },
+    "management": {
+        "INTRA_OP": None,
+        "INTER_OP": None,
+        "TOKENIZERS_PARALLELISM": True,
+        "PIN_CORES": False,
+    },
+}
+
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Aspect-Based Sentiment Analysis API",
@@ -19,10 +19,16 @@ from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from analyzer.views import healthz, metrics, readyz
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("analyzer.urls")),
     path("api-auth/", include("rest_framework.urls")),
+    # --- Health Checks ---
+    path("healthz", healthz, name="healthz"),
+    path("readyz", readyz, name="readyz"),
+    path("metrics", metrics, name="metrics"),
     # --- Swagger Routes ---
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ABSAapi.settings')
 
 application = get_wsgi_application()
+
+# inference threads of web workers (ABSA_RUNTIME), then start loading the AI
+# models (ABSA_MODEL_LOADING)
+from analyzer.registry import warm_up  # noqa: E402
+from analyzer.runtime import configure_runtime  # noqa: E402
+
+configure_runtime("web")
+warm_up()
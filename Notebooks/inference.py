@@ -40,8 +40,7 @@ def predict_sentiment(sentence, aspect) -> tuple[str, int | float | bool]:
         cleaned_text,
         aspect,
         return_tensors="pt",  # Return PyTorch tensors
-        truncation=True,
-        padding="max_length",
+        truncation=True,  # a single pair needs no padding
         max_length=128,
     )
 
@@ -1,9 +1,10 @@
 from django.contrib import admin
 
-from .models import AnalysisSession, AnalysisRecord, AspectResult
+from .models import AnalysisSession, AnalysisRecord, AspectResult, BulkShard
 
 
 # Register your models here.
 admin.site.register(AnalysisSession)
 admin.site.register(AnalysisRecord)
 admin.site.register(AspectResult)
+admin.site.register(BulkShard)
@@ -0,0 +1,291 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+import json
+import mmap
+import os
+import struct
+import torch
+
+
+MODEL_INPUTS = ["input_ids", "attention_mask", "token_type_ids"]
+
+# safetensors dtype tags -> torch dtypes
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+# (text, aspect) pairs used for parity checks, tracing and benchmarks
+SAMPLE_PAIRS = [
+    ("The food was great but the service was painfully slow.", "food"),
+    ("The food was great but the service was painfully slow.", "service"),
+    ("Prices are fair for the portion size.", "prices"),
+    ("We waited an hour for a table even with a reservation.", "table"),
+    ("The waiter was friendly and the wine list is impressive.", "wine list"),
+    ("Nothing special.", "general"),
+    ("Loved the ambience, the music was a bit too loud though.", "music"),
+    ("The pasta was cold and the dessert tasted like it came from a box.", "pasta"),
+]
+# Parity batches: the sample pairs the graphs are traced with, plus batches of
+# other sizes padded to other lengths, since serving pads every batch to its
+# own longest pair (a traced graph that kept the sample shape fails these)
+PARITY_BATCHES = [
+    SAMPLE_PAIRS,
+    SAMPLE_PAIRS[:3]
+    + [
+        (
+            "We booked a table for six on a Friday night. The starters came "
+            "quickly and the bread was warm, but the mains took almost an hour "
+            "and the steak arrived overcooked and lukewarm.",
+            "steak",
+        )
+    ],
+    [("Great coffee.", "coffee")],
+]
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model, device) -> None:
+        self.model = model
+        self.device = device
+
+    def logits(self, inputs) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(**inputs.to(self.device)).logits
+
+
+class TorchScriptBackend:
+    name = "torchscript"
+
+    def __init__(self, path) -> None:
+        self.module = torch.jit.load(str(path), map_location="cpu").eval()
+
+    def logits(self, inputs) -> torch.Tensor:
+        with torch.no_grad():
+            return self.module(*[inputs[name] for name in MODEL_INPUTS])
+
+
+class OnnxRuntimeBackend:
+    name = "onnx"
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImproperlyConfigured(
+                "The 'onnx' inference backend needs onnxruntime "
+                "(pip install onnxruntime)."
+            ) from e
+
+        # 0 lets onnxruntime pick the number of threads
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            str(path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def logits(self, inputs) -> torch.Tensor:
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(["logits"], feed)[0])
+
+
+def quantize_model(model):
+    # dynamic int8 quantization: Linear weights are stored as int8 and the
+    # activations are quantized on the fly, CPU only
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_torch_model(model_path=None, quantization=None, mmap_weights=None):
+    # eager model as selected by ABSA_QUANTIZATION: None (fp32), "dynamic"
+    # (quantized at load time) or "artifact" (int8 weights saved by the
+    # quantize_model command, the fp32 weights are never read). With
+    # mmap_weights the fp32 weights stay backed by model.safetensors.
+    model_path = str(model_path or settings.ABSA_MODEL_PATH)
+    if quantization is None:
+        quantization = getattr(settings, "ABSA_QUANTIZATION", None)
+    if mmap_weights is None:
+        mmap_weights = getattr(settings, "ABSA_SHARED_WEIGHTS", {}).get("MMAP", False)
+
+    if quantization == "artifact":
+        config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+        model = quantize_model(AutoModelForSequenceClassification.from_config(config))
+        # weights_only: the artifact is tensors (qint8 ones included) and
+        # plain containers, never arbitrary pickled objects, whatever the
+        # default of the installed torch version
+        state_dict = torch.load(
+            settings.ABSA_QUANTIZED_MODEL_PATH, map_location="cpu", weights_only=True
+        )
+        model.load_state_dict(state_dict)
+        return freeze_model(model)
+
+    if mmap_weights:
+        model = load_mmap_model(model_path)
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_path, local_files_only=True
+        )
+
+    if quantization == "dynamic":
+        return freeze_model(quantize_model(model))
+    if quantization:
+        raise ImproperlyConfigured(f"Unknown ABSA_QUANTIZATION: {quantization}")
+    return freeze_model(model)
+
+
+def freeze_model(model):
+    # inference only: no autograd state, so nothing writes next to the
+    # weights and their pages stay shared between forked workers
+    for param in model.parameters():
+        param.requires_grad_(False)
+    return model.eval()
+
+
+def load_mmap_model(model_path):
+    # build the architecture from its config, then point its tensors at the
+    # mapped model.safetensors instead of copying the weights into memory
+    path = os.path.join(model_path, "model.safetensors")
+    if not os.path.exists(path):
+        raise ImproperlyConfigured(
+            f"ABSA_SHARED_WEIGHTS['MMAP'] needs {path} (save_pretrained with "
+            "safe_serialization=True)."
+        )
+
+    config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+    model = AutoModelForSequenceClassification.from_config(config)
+    missing, unexpected = model.load_state_dict(
+        mmap_safetensors(path), strict=False, assign=True
+    )
+    if unexpected or missing:
+        raise ImproperlyConfigured(
+            f"{path} does not match the model config "
+            f"(missing: {missing}, unexpected: {unexpected})."
+        )
+    return model
+
+
+def mmap_safetensors(path) -> dict:
+    # name -> tensor viewing a private (copy-on-write) mapping of the file,
+    # pages are read lazily and shared by every process mapping it
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    (header_size,) = struct.unpack("<Q", mapped[:8])
+    header = json.loads(mapped[8 : 8 + header_size])
+    header.pop("__metadata__", None)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        if start == end:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(
+            mapped,
+            dtype=dtype,
+            offset=data_start + start,
+            count=(end - start) // dtype.itemsize,
+        ).view(info["shape"])
+    return tensors
+
+
+def create_backend(name=None, model=None, device=None):
+    name = name or getattr(settings, "ABSA_INFERENCE_BACKEND", "torch")
+
+    if name == "torch":
+        return TorchBackend(model, device or torch.device("cpu"))
+
+    if name == "onnx":
+        threads = getattr(settings, "ABSA_ONNX_THREADS", {})
+        return OnnxRuntimeBackend(
+            settings.ABSA_ONNX_MODEL_PATH,
+            intra_op_threads=threads.get("INTRA_OP", 0),
+            inter_op_threads=threads.get("INTER_OP", 0),
+        )
+
+    if name == "torchscript":
+        return TorchScriptBackend(settings.ABSA_TORCHSCRIPT_MODEL_PATH)
+
+    raise ImproperlyConfigured(f"Unknown ABSA_INFERENCE_BACKEND: {name}")
+
+
+def sample_inputs(tokenizer, pairs=None):
+    pairs = pairs or SAMPLE_PAIRS
+    return tokenizer(
+        [text for text, _ in pairs],
+        [aspect for _, aspect in pairs],
+        return_tensors="pt",
+        truncation=True,
+        max_length=getattr(settings, "ABSA_MAX_SEQ_LENGTH", 128),
+        padding=True,
+    )
+
+
+class LogitsOnly(torch.nn.Module):
+    # positional inputs -> logits tensor, the signature exporters can trace
+    def __init__(self, model) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids) -> torch.Tensor:
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+        ).logits
+
+
+def export_onnx(model, tokenizer, path, opset=17) -> None:
+    # batch and sequence axes stay dynamic so batches can be padded per call
+    inputs = sample_inputs(tokenizer)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in MODEL_INPUTS}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    torch.onnx.export(
+        LogitsOnly(model).eval(),
+        tuple(inputs[name] for name in MODEL_INPUTS),
+        str(path),
+        input_names=MODEL_INPUTS,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=opset,
+        dynamo=False,
+    )
+
+
+def export_torchscript(model, tokenizer, path) -> None:
+    inputs = sample_inputs(tokenizer)
+    with torch.no_grad():
+        traced = torch.jit.trace(
+            LogitsOnly(model).eval(), tuple(inputs[name] for name in MODEL_INPUTS)
+        )
+    traced.save(str(path))
+
+
+def max_logit_diff(reference, candidate, tokenizer, pairs=None) -> float:
+    # parity check: largest absolute logit difference on the sample pairs
+    inputs = sample_inputs(tokenizer, pairs)
+    expected = reference.logits(inputs).float().cpu()
+    actual = candidate.logits(inputs).float().cpu()
+    if expected.shape != actual.shape:
+        return float("inf")
+    return (expected - actual).abs().max().item()
@@ -0,0 +1,207 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from django.conf import settings
+
+import os
+import queue
+import threading
+import time
+
+from .profiling import current_trace, shared_stages
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class BatchScheduler:
+    # Collects the (text, aspect) pairs of concurrent requests and runs them
+    # through the handler (ABSAService.pair_logits) together. A batch is
+    # flushed once it holds max_batch_size pairs or its oldest request has
+    # waited max_wait_ms, whichever comes first. The stages the handler times
+    # are added to the (sampled) trace of every request of the batch.
+    def __init__(
+        self,
+        handler,
+        max_batch_size=64,
+        max_wait_ms=5,
+        max_queue_depth=1024,
+        result_timeout=30.0,
+    ) -> None:
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # seconds a caller waits for its result before giving up
+        self.result_timeout = result_timeout
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._worker = None
+        self._lock = threading.Lock()
+
+        # counters, updated under _lock
+        self.batches = 0
+        self.requests = 0
+        self.pairs = 0
+
+    def submit(self, pairs) -> Future:
+        future = Future()
+        try:
+            self._queue.put_nowait((pairs, future, current_trace()))
+        except queue.Full:
+            raise QueueFullError("Inference queue is full, try again later.")
+
+        self._ensure_worker()
+        return future
+
+    def run(self, pairs) -> list:
+        # submit and wait up to result_timeout; a caller that gives up cancels
+        # its request so a batch still waiting in the queue skips it
+        future = self.submit(pairs)
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            batches, requests, pairs = self.batches, self.requests, self.pairs
+        return {
+            "queued_requests": self._queue.qsize(),
+            "batches": batches,
+            "requests": requests,
+            "pairs": pairs,
+            "avg_batch_pairs": round(pairs / batches, 2) if batches else 0.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="absa-batch-scheduler", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        batch = []
+        try:
+            while True:
+                batch = [self._queue.get()]
+                size = len(batch[0][0])
+                deadline = time.monotonic() + self.max_wait
+
+                # keep collecting until the batch is full or the wait is over
+                while size < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+                    size += len(item[0])
+
+                self._flush(batch)
+        finally:
+            # the worker is dying (an error outside _flush, or a
+            # BaseException): fail its batch and everything queued instead of
+            # leaving those callers waiting, the next submit starts a new one
+            error = RuntimeError("Inference batching worker stopped.")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            while True:
+                try:
+                    _, future, _ = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+
+    def _flush(self, batch) -> None:
+        # callers that gave up (cancelled futures) are left out; the others
+        # are marked running and can no longer be cancelled
+        batch[:] = [
+            (request_pairs, future, current)
+            for request_pairs, future, current in batch
+            if future.set_running_or_notify_cancel()
+        ]
+        if not batch:
+            return
+
+        pairs = [pair for request_pairs, _, _ in batch for pair in request_pairs]
+        try:
+            with shared_stages(current for _, _, current in batch):
+                logits = self.handler(pairs, max_batch_size=max(len(pairs), 1))
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        # resolve every caller with its own slice of the logits
+        start = 0
+        for request_pairs, future, _ in batch:
+            end = start + len(request_pairs)
+            future.set_result(logits[start:end])
+            start = end
+
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.pairs += len(pairs)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_batch_scheduler(handler):
+    # process-wide BatchScheduler, or None when ABSA_BATCHING is disabled
+    global _scheduler
+
+    config = getattr(settings, "ABSA_BATCHING", {})
+    if not config.get("ENABLED"):
+        return None
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BatchScheduler(
+                handler,
+                max_batch_size=config.get("MAX_BATCH_SIZE", 64),
+                max_wait_ms=config.get("MAX_WAIT_MS", 5),
+                max_queue_depth=config.get("MAX_QUEUE_DEPTH", 1024),
+                result_timeout=config.get("RESULT_TIMEOUT", 30.0),
+            )
+
+    return _scheduler
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    # dedicated threads for blocking inference work awaited by async views, so
+    # the event loop and the default executor stay free
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ABSA_ASYNC_EXECUTOR_WORKERS", 4),
+                thread_name_prefix="absa-inference",
+            )
+
+    return _executor
+
+
+def _reset_after_fork() -> None:
+    # worker threads do not survive a fork, start fresh ones in the child
+    global _scheduler, _scheduler_lock, _executor, _executor_lock
+    _scheduler = None
+    _scheduler_lock = threading.Lock()
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
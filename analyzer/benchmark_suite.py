@@ -0,0 +1,160 @@
+import json
+import os
+import random
+
+
+# Synthetic restaurant reviews: every review is drawn from these templates
+# and word lists by a seeded generator, so a given (count, seed) gives the
+# same corpus on every machine without shipping a data file.
+TEMPLATES = [
+    "The {aspect} was {opinion}.",
+    "The {aspect} was {opinion} but the {aspect2} was {opinion2}.",
+    "I {verb} the {aspect} at {place}, the {aspect2} was {opinion2}.",
+    "{Opinion} {aspect} and {opinion2} {aspect2}, would come back for the {aspect3}.",
+    "We waited {minutes} minutes for the {aspect}. The {aspect2} was {opinion2} though!",
+    "Visited {place} last {day}: {opinion} {aspect}, {opinion2} {aspect2} and the "
+    "{aspect3} was {opinion3}. Overall the staff at {place} made it worth it.",
+]
+ASPECTS = [
+    "food", "service", "pizza", "pasta", "waiter", "price", "staff", "ambience",
+    "drinks", "wine list", "table", "music", "menu", "dessert", "coffee",
+    "portion size", "burger", "fries", "salad", "reservation",
+]
+OPINIONS = [
+    "great", "slow", "amazing", "terrible", "cold", "friendly", "overpriced",
+    "delicious", "bland", "excellent", "rude", "cosy", "noisy", "fresh", "average",
+]
+VERBS = ["loved", "hated", "enjoyed", "liked", "regretted"]
+PLACES = ["Pizza Hut", "Mario's", "The Green Fork", "Luigi Bistro", "Cafe Roma"]
+DAYS = ["Monday", "Friday", "Sunday", "weekend", "night"]
+
+
+def synthetic_reviews(count, seed=0) -> list:
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(count):
+        aspects = rng.sample(ASPECTS, 3)
+        opinions = [rng.choice(OPINIONS) for _ in range(3)]
+        reviews.append(
+            rng.choice(TEMPLATES).format(
+                aspect=aspects[0],
+                aspect2=aspects[1],
+                aspect3=aspects[2],
+                opinion=opinions[0],
+                Opinion=opinions[0].capitalize(),
+                opinion2=opinions[1],
+                opinion3=opinions[2],
+                verb=rng.choice(VERBS),
+                place=rng.choice(PLACES),
+                minutes=rng.randint(5, 90),
+                day=rng.choice(DAYS),
+            )
+        )
+    return reviews
+
+
+def build_tiny_model(path, seed=0) -> None:
+    # Randomly initialized BERT sequence classifier with the production
+    # architecture (3 labels, pair inputs) at a fraction of the size, with a
+    # WordPiece vocabulary covering the synthetic corpus.
+    from transformers import BertConfig, BertForSequenceClassification
+    from transformers import BertTokenizerFast
+
+    import torch
+
+    os.makedirs(path, exist_ok=True)
+    words = {
+        word.lower()
+        for text in TEMPLATES + ASPECTS + OPINIONS + VERBS + PLACES + DAYS
+        for word in text.replace("{", " ").replace("}", " ").split()
+    }
+    characters = [chr(c) for c in range(33, 127)]
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(
+        set(characters) | {f"##{c}" for c in characters} | words
+    )
+    vocab_path = os.path.join(path, "vocab.txt")
+    with open(vocab_path, "w") as f:
+        f.write("\n".join(vocab) + "\n")
+
+    tokenizer = BertTokenizerFast(vocab_path)
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+        max_position_embeddings=512,
+        num_labels=3,
+        id2label={0: "negative", 1: "neutral", 2: "positive"},
+        label2id={"negative": 0, "neutral": 1, "positive": 2},
+    )
+    BertForSequenceClassification(config).save_pretrained(path)
+
+
+def build_spacy_pipeline(path, seed=0) -> None:
+    # Untrained pipeline with the components aspect extraction uses, so noun
+    # chunks and entities are produced (arbitrary, but at a realistic cost).
+    import spacy
+    from spacy.training import Example
+
+    spacy.util.fix_random_seed(seed)
+    nlp = spacy.blank("en")
+    for name in ["tok2vec", "tagger", "attribute_ruler", "parser", "ner"]:
+        nlp.add_pipe(name)
+    nlp.get_pipe("attribute_ruler").add([[{"TAG": "NN"}]], {"POS": "NOUN"})
+
+    def examples():
+        # only sets up the label sets, the weights stay random
+        yield Example.from_dict(
+            nlp.make_doc("The food was great at Pizza Hut"),
+            {
+                "tags": ["DT", "NN", "VBD", "JJ", "IN", "NNP", "NNP"],
+                "heads": [1, 2, 2, 2, 2, 6, 4],
+                "deps": ["det", "nsubj", "ROOT", "acomp", "prep", "compound", "pobj"],
+                "entities": ["O", "O", "O", "O", "O", "B-ORG", "L-ORG"],
+            },
+        )
+
+    nlp.initialize(lambda: list(examples()))
+    nlp.to_disk(path)
+
+
+def flatten(results, prefix="") -> dict:
+    # {"single_text": {"p50_ms": 1.0}} -> {"single_text.p50_ms": 1.0}
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def higher_is_better(metric) -> bool:
+    return metric.endswith("_per_sec")
+
+
+def compare(results, baseline, tolerance) -> list:
+    # (metric, baseline, current, relative change, regressed) of every
+    # metric in both runs; a regression is a change for the worse beyond
+    # `tolerance` (0.1 = 10%)
+    current = flatten(results["metrics"])
+    rows = []
+    for metric, before in sorted(flatten(baseline["metrics"]).items()):
+        after = current.get(metric)
+        if after is None or not before:
+            continue
+
+        change = (after - before) / before
+        worse = -change if higher_is_better(metric) else change
+        rows.append((metric, before, after, change, worse > tolerance))
+    return rows
+
+
+def load_results(path) -> dict:
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,87 @@
+import os
+import resource
+import sys
+import time
+
+
+def percentile(values, q) -> float:
+    # nearest-rank percentile, q in [0, 100]
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def time_calls(fn, iterations, warmup=1) -> list:
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def summarize(timings, items_per_call=1) -> dict:
+    total = sum(timings)
+    return {
+        "calls": len(timings),
+        "mean_ms": round(total / len(timings) * 1000, 3) if timings else 0.0,
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "items_per_sec": round(items_per_call * len(timings) / total, 2)
+        if total
+        else 0.0,
+    }
+
+
+def current_rss_bytes() -> int:
+    # resident set size of this process right now (Linux), else peak RSS
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# /proc/<pid>/smaps_rollup fields kept by process_memory
+SMAPS_FIELDS = {
+    "Rss",
+    "Pss",
+    "Shared_Clean",
+    "Shared_Dirty",
+    "Private_Clean",
+    "Private_Dirty",
+    "Swap",
+}
+
+
+def process_memory(pid="self") -> dict:
+    # memory of a process in bytes (Linux): "unique" pages are mapped by this
+    # process only (what killing it frees), "shared" pages also by others
+    # (e.g. preloaded weights inherited from the master), "pss" splits the
+    # shared pages evenly between the processes mapping them
+    values = dict.fromkeys(SMAPS_FIELDS, 0)
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in values:
+                values[name] = int(rest.split()[0]) * 1024
+
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "unique": values["Private_Clean"] + values["Private_Dirty"],
+        "shared": values["Shared_Clean"] + values["Shared_Dirty"],
+        "swap": values["Swap"],
+    }
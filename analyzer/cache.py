@@ -0,0 +1,267 @@
+from array import array
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+import copy
+import hashlib
+import os
+import threading
+import time
+
+
+class LRUCacheBackend:
+    # in-process cache, evicts the least recently used entry past max_entries.
+    # Values are copied in and out (as the pickling Django caches do), so a
+    # caller mutating a result never changes what later hits get.
+    def __init__(self, max_entries=10000, timeout=None) -> None:
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys) -> dict:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+
+                expires_at, value = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._entries[key]
+                    continue
+
+                self._entries.move_to_end(key)
+                found[key] = value
+        return copy.deepcopy(found)
+
+    def set_many(self, mapping) -> None:
+        expires_at = None
+        if self.timeout is not None:
+            expires_at = time.monotonic() + self.timeout
+
+        mapping = copy.deepcopy(mapping)
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    # shared tier through Django's cache framework (Redis, locmem, ...)
+    def __init__(self, alias="default", timeout=None) -> None:
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get_many(self, keys) -> dict:
+        return self.cache.get_many(keys)
+
+    def set_many(self, mapping) -> None:
+        self.cache.set_many(mapping, timeout=self.timeout)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+class ResultCache:
+    # maps cleaned text -> "analysis" list of ABSAService.analyze_sentiment
+    def __init__(self, backend, fingerprint) -> None:
+        self.backend = backend
+        self.fingerprint = fingerprint
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, cleaned_text) -> str:
+        digest = hashlib.sha256(cleaned_text.encode("utf-8")).hexdigest()
+        return f"absa:result:{self.fingerprint}:{digest}"
+
+    def get_many(self, cleaned_texts) -> dict:
+        keys = {self.key(text): text for text in cleaned_texts}
+        found = self.backend.get_many(list(keys))
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return {keys[key]: analysis for key, analysis in found.items()}
+
+    def set_many(self, analyses) -> None:
+        self.backend.set_many(
+            {self.key(text): analysis for text, analysis in analyses.items()}
+        )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "fingerprint": self.fingerprint,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class PairLogitsMemo:
+    # (text, aspect) pair -> logits, keyed on the model fingerprint and the
+    # packed token ids the model actually sees. Bounded by an estimate of
+    # the bytes it holds.
+    ENTRY_OVERHEAD = 200  # dict slot, key/value objects and the logits tuple
+
+    def __init__(self, max_bytes, fingerprint="") -> None:
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint
+        self._prefix = f"{fingerprint}:".encode()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, input_ids) -> bytes:
+        return self._prefix + array("i", input_ids).tobytes()
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                logits = self._entries.get(key)
+                if logits is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = logits
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, mapping) -> None:
+        with self._lock:
+            for key, logits in mapping.items():
+                if key not in self._entries:
+                    self.size += len(key) + self.ENTRY_OVERHEAD
+                self._entries[key] = tuple(logits)
+                self._entries.move_to_end(key)
+
+            while self._entries and self.size > self.max_bytes:
+                key, _ = self._entries.popitem(last=False)
+                self.size -= len(key) + self.ENTRY_OVERHEAD
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "fingerprint": self.fingerprint,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def model_fingerprint(model_path=None) -> str:
+    # cheap version id of the model folder: names, sizes and mtimes of its
+    # files, plus the settings that change what the model is given or how
+    # its weights are served (int8 and the exported backends give slightly
+    # different logits)
+    model_path = str(model_path or settings.ABSA_MODEL_PATH)
+    digest = hashlib.sha256()
+    digest.update(
+        repr(
+            (
+                getattr(settings, "ABSA_MAX_SEQ_LENGTH", 128),
+                getattr(settings, "ABSA_LONG_TEXT_MODE", "window"),
+                getattr(settings, "ABSA_SENTENCE_WINDOW", 1),
+                getattr(settings, "ABSA_LONG_DOCUMENT_CHARS", 1000),
+                getattr(settings, "ABSA_QUANTIZATION", None),
+                getattr(settings, "ABSA_INFERENCE_BACKEND", "torch"),
+            )
+        ).encode()
+    )
+
+    if os.path.isdir(model_path):
+        for name in sorted(os.listdir(model_path)):
+            stat = os.stat(os.path.join(model_path, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+
+    return digest.hexdigest()[:16]
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    # process-wide ResultCache, or None when ABSA_RESULT_CACHE is disabled
+    global _result_cache
+
+    config = getattr(settings, "ABSA_RESULT_CACHE", {})
+    backend_name = config.get("BACKEND")
+    if not backend_name:
+        return None
+
+    with _result_cache_lock:
+        if _result_cache is None:
+            timeout = config.get("TIMEOUT")
+            if backend_name == "lru":
+                backend = LRUCacheBackend(
+                    max_entries=config.get("MAX_ENTRIES", 10000), timeout=timeout
+                )
+            elif backend_name == "django":
+                backend = DjangoCacheBackend(
+                    alias=config.get("CACHE_ALIAS", "default"), timeout=timeout
+                )
+            else:
+                raise ValueError(f"Unknown ABSA_RESULT_CACHE backend: {backend_name}")
+
+            _result_cache = ResultCache(backend, model_fingerprint())
+
+    return _result_cache
+
+
+_pair_memo = None
+_pair_memo_lock = threading.Lock()
+
+
+def get_pair_memo():
+    # process-wide PairLogitsMemo, or None when ABSA_PAIR_MEMO is disabled
+    global _pair_memo
+
+    config = getattr(settings, "ABSA_PAIR_MEMO", {})
+    if not config.get("ENABLED"):
+        return None
+
+    with _pair_memo_lock:
+        if _pair_memo is None:
+            _pair_memo = PairLogitsMemo(
+                config.get("MAX_BYTES", 64 * 1024 * 1024), model_fingerprint()
+            )
+
+    return _pair_memo
+
+
+def cache_stats() -> dict:
+    result_cache = get_result_cache()
+    pair_memo = get_pair_memo()
+    return {
+        "result_cache": result_cache.stats() if result_cache else None,
+        "pair_memo": pair_memo.stats() if pair_memo else None,
+    }
@@ -0,0 +1,92 @@
+from django.conf import settings
+
+import time
+
+from .cache import get_result_cache
+from .profiling import stage, timed_iter
+from .services import ABSAService
+
+
+# Runs ABSA over many rows at once: the (text, aspect) pairs of every row are
+# pooled, packed into length-sorted batches under a token budget, and the
+# predictions are scattered back to the rows they came from.
+class BulkInferenceEngine:
+    def __init__(self, token_budget=None, max_batch_size=None) -> None:
+        self.token_budget = token_budget or getattr(
+            settings, "ABSA_BULK_TOKEN_BUDGET", 8192
+        )
+        self.max_batch_size = max_batch_size or getattr(
+            settings, "ABSA_BULK_MAX_BATCH_SIZE", 256
+        )
+
+        # throughput counters
+        self.rows = 0
+        self.reused_rows = 0
+        self.pairs = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        if not self.seconds:
+            return 0.0
+        return self.rows / self.seconds
+
+    def analyze(self, texts) -> list:
+        started = time.perf_counter()
+
+        with stage("clean"):
+            cleaned_texts = ABSAService.clean_texts(texts)
+
+        # identical rows are analyzed once, and texts seen before (in this
+        # session or elsewhere) are served from the result cache
+        unique_texts = list(dict.fromkeys(cleaned_texts))
+        analyses = {}
+        result_cache = get_result_cache()
+        if result_cache is not None:
+            analyses.update(result_cache.get_many(unique_texts))
+        pending_texts = [text for text in unique_texts if text not in analyses]
+
+        # gather pairs of all pending texts
+        plans = []
+        pairs = []
+        docs = timed_iter(ABSAService.pipe_docs(pending_texts), "parse")
+        for cleaned_text, doc in zip(pending_texts, docs):
+            with stage("aspects"):
+                aspects = ABSAService.aspects_from_doc(doc) or [
+                    ABSAService.FALLBACK_ASPECT
+                ]
+                text_pairs, owners = ABSAService.plan_pairs(cleaned_text, doc, aspects)
+            plans.append((aspects, owners))
+            pairs.extend(text_pairs)
+
+        with stage("inference"):
+            logits = ABSAService.pair_logits(
+                pairs,
+                max_batch_size=self.max_batch_size,
+                token_budget=self.token_budget,
+            )
+
+        # scatter logits back to the text each pair came from
+        fresh_analyses = {}
+        start = 0
+        with stage("aggregate"):
+            for cleaned_text, (aspects, owners) in zip(pending_texts, plans):
+                end = start + len(owners)
+                fresh_analyses[cleaned_text] = ABSAService.aggregate_predictions(
+                    aspects, owners, logits[start:end]
+                )
+                start = end
+
+        if result_cache is not None and fresh_analyses:
+            result_cache.set_many(fresh_analyses)
+        analyses.update(fresh_analyses)
+
+        self.rows += len(texts)
+        self.reused_rows += len(texts) - len(pending_texts)
+        self.pairs += len(pairs)
+        self.seconds += time.perf_counter() - started
+
+        return [
+            {"original_text": text, "analysis": analyses[cleaned_text]}
+            for text, cleaned_text in zip(texts, cleaned_texts)
+        ]
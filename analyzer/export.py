@@ -0,0 +1,203 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import StreamingHttpResponse
+from itertools import groupby, islice
+from operator import itemgetter
+
+import csv
+import io
+import json
+
+from .models import AnalysisRecord
+
+
+# one row per aspect result, the flat layout of the CSV and Parquet exports
+EXPORT_COLUMNS = [
+    "record_id",
+    "source_row",
+    "original_text",
+    "aspect",
+    "sentiment",
+    "confidence",
+]
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_response(
+    session, export_format, asynchronous=False
+) -> StreamingHttpResponse:
+    # Streams the results of a session straight from a DB cursor: rows are
+    # fetched CHUNK_SIZE at a time (a server-side cursor on PostgreSQL) and
+    # written out per chunk, so memory stays flat whatever the session size.
+    # Under ASGI (asynchronous) the chunks are handed over as an async
+    # iterator, a sync one would be read to the end before sending anything.
+    chunk_size = getattr(settings, "ABSA_EXPORT", {}).get("CHUNK_SIZE", 2000)
+    writers = {"csv": stream_csv, "ndjson": stream_ndjson, "parquet": stream_parquet}
+    if export_format == "parquet":
+        _import_pyarrow()  # fail before the response starts
+
+    chunks = writers[export_format](export_rows(session, chunk_size), chunk_size)
+    response = StreamingHttpResponse(
+        _aiter_chunks(chunks) if asynchronous else chunks,
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="session-{session.id}.{export_format}"'
+    )
+    return response
+
+
+def export_rows(session, chunk_size):
+    # (record id, source row, text, aspect, sentiment, confidence) in csv
+    # order (the ids of sharded sessions interleave their shards); a record
+    # without results gives one row with None aspect fields
+    return (
+        AnalysisRecord.objects.filter(session=session)
+        .order_by("source_row", "id", "results__id")
+        .values_list(
+            "id",
+            "source_row",
+            "original_text",
+            "results__aspect",
+            "results__sentiment",
+            "results__confidence",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def stream_csv(rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # header of an empty session
+
+
+def stream_ndjson(rows, chunk_size):
+    # one JSON object per record, with its results nested as in the
+    # retrieve endpoint
+    lines = []
+    for _, group in groupby(rows, key=itemgetter(0)):
+        group = list(group)
+        record_id, source_row, original_text = group[0][:3]
+        results = [
+            {"aspect": aspect, "sentiment": sentiment, "confidence": confidence}
+            for _, _, _, aspect, sentiment, confidence in group
+            if aspect is not None
+        ]
+        lines.append(
+            json.dumps(
+                {
+                    "id": record_id,
+                    "source_row": source_row,
+                    "original_text": original_text,
+                    "results": results,
+                },
+                ensure_ascii=False,
+            )
+        )
+
+        if len(lines) >= chunk_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def stream_parquet(rows, chunk_size):
+    # one row group per chunk, each handed on as soon as it is written (the
+    # file footer follows the last one)
+    pa, pq = _import_pyarrow()
+    schema = pa.schema(
+        [
+            ("record_id", pa.int64()),
+            ("source_row", pa.int64()),
+            ("original_text", pa.string()),
+            ("aspect", pa.string()),
+            ("sentiment", pa.string()),
+            ("confidence", pa.float64()),
+        ]
+    )
+
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunks(rows, chunk_size):
+            columns = zip(*chunk)
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [
+                        pa.array(column, type=field.type)
+                        for column, field in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            if data := sink.drain():
+                yield data
+
+    yield sink.drain()
+
+
+class _ChunkSink(io.RawIOBase):
+    # write-only file the Parquet writer streams into, emptied by drain()
+    def __init__(self) -> None:
+        super().__init__()
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _chunks(rows, chunk_size):
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+async def _aiter_chunks(chunks):
+    # each chunk is still made by the sync code, on the thread the DB
+    # connection (and its cursor) belongs to; the event loop only awaits it
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()  # client gone: release the cursor
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImproperlyConfigured(
+            "The Parquet export needs pyarrow (pip install pyarrow)."
+        ) from e
+    return pyarrow, pyarrow.parquet
@@ -0,0 +1,177 @@
+from itertools import islice
+
+import csv
+import io
+
+
+def count_lines(path, block_size=1 << 20) -> int:
+    # cheap pre-scan for progress: counts line breaks in raw byte blocks, so
+    # quoted fields spanning several lines make it a slight over-estimate
+    lines = 0
+    last_block = b""
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            lines += block.count(b"\n")
+            last_block = block
+
+    if last_block and not last_block.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+def estimate_rows(path) -> int:
+    rows = count_lines(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        if _has_header(next(csv.reader(f), None)):
+            rows -= 1
+    return max(rows, 0)
+
+
+def plan_shards(path, shard_bytes, block_size=1 << 20) -> list:
+    # Splits the file into byte ranges of about shard_bytes that start and
+    # end on record boundaries (line breaks outside quoted fields, see
+    # _iter_records). Returns (start, end, start_row, rows) per shard, rows
+    # numbered from 0 without the header.
+    shards = []
+    start = 0
+    rows = 0
+    offset = 0
+
+    with open(path, "rb", buffering=block_size) as f:
+        for record in _iter_records(f):
+            offset += len(record)
+            rows += 1
+            # cut at the first record end past the target size
+            if offset - start >= shard_bytes:
+                shards.append([start, offset, rows])
+                start = offset
+                rows = 0
+
+    if offset > start:
+        shards.append([start, offset, rows])
+
+    # number data rows from 0, the header is not one
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        header_rows = 1 if _has_header(next(csv.reader(f), None)) else 0
+
+    planned = []
+    next_row = -header_rows
+    for start, end, rows in shards:
+        first_row = max(next_row, 0)
+        next_row += rows
+        planned.append((start, end, first_row, next_row - first_row))
+    return planned
+
+
+def iter_row_chunks(path, chunk_rows, start=0, end=None):
+    # stream the csv (or the byte range [start, end) of it, see plan_shards)
+    # and yield (rows, offset) per chunk of at most `chunk_rows` rows, where
+    # offset is the byte position the next chunk starts at (a checkpoint to
+    # resume from). Only one chunk is held in memory at a time.
+    with open(path, "rb") as raw:
+        records = _iter_records(io.BufferedReader(_ByteRange(raw, start, end)))
+        offset = start
+
+        if start == 0:
+            first_record = next(records, None)
+            if first_record is None:
+                raise ValueError("CSV file is empty")
+
+            if _has_header(_parse_records([first_record])[0]):
+                print("   -> Header detected, skipping first row.")
+                offset += len(first_record)
+            else:
+                records = _prepend(first_record, records)
+
+        while chunk := list(islice(records, chunk_rows)):
+            offset += sum(len(record) for record in chunk)
+            yield _parse_records(chunk), offset
+
+
+def _iter_records(f):
+    # raw csv records: lines joined while a quoted field is still open
+    pending = []
+    quoted = False
+    for line in f:
+        if quoted or b'"' in line:
+            quoted = _ends_quoted(line, quoted)
+        if not quoted and not pending:
+            yield line  # the common case, a record on a single line
+            continue
+
+        pending.append(line)
+        if not quoted:
+            yield b"".join(pending)
+            pending = []
+
+    if pending:
+        yield b"".join(pending)  # unterminated quoted field at the end
+
+
+def _ends_quoted(line, quoted) -> bool:
+    # whether a quoted field is still open at the end of the line, reading it
+    # the way csv.reader does: a quote opens a quoted field only as the first
+    # character of a field (elsewhere, as in 'a 5" screen', it is data) and
+    # a doubled quote inside a quoted field is an escaped one
+    pos = 0
+    field_start = not quoted
+    while pos < len(line):
+        if quoted:
+            quote = line.find(b'"', pos)
+            if quote == -1:
+                return True
+            if line[quote + 1 : quote + 2] == b'"':
+                pos = quote + 2  # escaped quote, the field goes on
+                continue
+            quoted = False
+            field_start = False  # whatever follows belongs to the same field
+            pos = quote + 1
+        elif field_start and line[pos : pos + 1] == b'"':
+            quoted = True
+            pos += 1
+        else:
+            comma = line.find(b",", pos)
+            if comma == -1:
+                return False
+            field_start = True
+            pos = comma + 1
+
+    return quoted
+
+
+def _parse_records(records) -> list:
+    text = io.TextIOWrapper(
+        io.BytesIO(b"".join(records)), encoding="utf-8", errors="replace"
+    )
+    return list(csv.reader(text))
+
+
+class _ByteRange(io.RawIOBase):
+    # raw stream over bytes [start, end) of an open binary file
+    def __init__(self, f, start=0, end=None) -> None:
+        f.seek(start)
+        self.f = f
+        self.remaining = None if end is None else end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = len(buffer)
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+
+        data = self.f.read(size)
+        buffer[: len(data)] = data
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return len(data)
+
+
+def _has_header(row) -> bool:
+    return bool(row) and "text" in str(row[0]).lower()
+
+
+def _prepend(row, reader):
+    yield row
+    yield from reader
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+import torch
+
+from analyzer.backends import (
+    SAMPLE_PAIRS,
+    TorchBackend,
+    create_backend,
+    max_logit_diff,
+    sample_inputs,
+)
+from analyzer.benchmarking import summarize, time_calls
+
+
+class Command(BaseCommand):
+    help = "Compare latency and throughput of the inference backends on CPU."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--backends", nargs="+", default=["torch", "onnx"])
+        parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=3)
+
+    def handle(self, *args, **options) -> None:
+        model_path = str(settings.ABSA_MODEL_PATH)
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+        backends = {}
+        for name in options["backends"]:
+            try:
+                if name == "torch":
+                    model = AutoModelForSequenceClassification.from_pretrained(
+                        model_path
+                    ).eval()
+                    backends[name] = TorchBackend(model, torch.device("cpu"))
+                else:
+                    backends[name] = create_backend(name)
+            except (ImproperlyConfigured, OSError, RuntimeError) as e:
+                raise CommandError(f"Could not load the '{name}' backend: {e}")
+
+        # parity of every exported backend against eager PyTorch
+        if "torch" in backends:
+            for name, backend in backends.items():
+                if name != "torch":
+                    diff = max_logit_diff(backends["torch"], backend, tokenizer)
+                    self.stdout.write(f"🔍 {name} vs torch max logit diff {diff:.2e}")
+
+        self.stdout.write(
+            f"{'backend':<12} {'batch':>5} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'pairs/sec':>10}"
+        )
+        for batch_size in options["batch_sizes"]:
+            pairs = (SAMPLE_PAIRS * (batch_size // len(SAMPLE_PAIRS) + 1))[:batch_size]
+            inputs = sample_inputs(tokenizer, pairs)
+
+            for name, backend in backends.items():
+                timings = time_calls(
+                    lambda: backend.logits(inputs),
+                    options["iterations"],
+                    warmup=options["warmup"],
+                )
+                stats = summarize(timings, items_per_call=batch_size)
+                self.stdout.write(
+                    f"{name:<12} {batch_size:>5} {stats['p50_ms']:>9.2f} "
+                    f"{stats['p95_ms']:>9.2f} {stats['items_per_sec']:>10.1f}"
+                )
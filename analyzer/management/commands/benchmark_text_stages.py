@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from itertools import islice
+
+from analyzer.backends import SAMPLE_PAIRS
+from analyzer.benchmarking import summarize, time_calls
+from analyzer.ingest import iter_row_chunks
+from analyzer.registry import ModelsUnavailable
+from analyzer.services import ABSAService
+
+
+# variants of the sample reviews that exercise every cleaning step
+SAMPLE_TEXTS = [text for text, _ in SAMPLE_PAIRS] + [
+    "Great burger 🍔🔥 but fries were soggy &amp; cold, see https://example.com/r/1",
+    "Check   www.example.com   for   the   menu\n\n(the pasta is 10/10)",
+    "Café was cosy, staff très sympa 👍",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-stage timings of the pre-model text pipeline: cleaning, spaCy "
+        "parsing, aspect extraction, nested-aspect filtering and pair planning."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--file", help="CSV of reviews (first column), default: sample texts"
+        )
+        parser.add_argument("--texts", type=int, default=1000)
+        parser.add_argument("--iterations", type=int, default=5)
+        parser.add_argument("--warmup", type=int, default=1)
+
+    def handle(self, *args, **options) -> None:
+        texts = self._load_texts(options["file"], options["texts"])
+        iterations, warmup = options["iterations"], options["warmup"]
+
+        try:
+            cleaned_texts = ABSAService.clean_texts(texts)
+            docs = list(ABSAService.pipe_docs(cleaned_texts))
+        except ModelsUnavailable as e:
+            raise CommandError(str(e))
+
+        candidates = [self._candidates(doc) for doc in docs]
+        aspects = [
+            ABSAService.aspects_from_doc(doc) or [ABSAService.FALLBACK_ASPECT]
+            for doc in docs
+        ]
+
+        stages = {
+            "clean": lambda: ABSAService.clean_texts(texts),
+            "parse": lambda: list(ABSAService.pipe_docs(cleaned_texts)),
+            "aspects": lambda: [ABSAService.aspects_from_doc(doc) for doc in docs],
+            "dedup": lambda: [
+                ABSAService.drop_nested_aspects(found) for found in candidates
+            ],
+            "plan_pairs": lambda: [
+                ABSAService.plan_pairs(text, doc, text_aspects)
+                for text, doc, text_aspects in zip(cleaned_texts, docs, aspects)
+            ],
+        }
+
+        self.stdout.write(
+            f"📝 {len(texts)} texts, {iterations} iterations "
+            "(aspects includes dedup)"
+        )
+        self.stdout.write(
+            f"{'stage':<12} {'p50 ms':>9} {'p95 ms':>9} {'us/text':>9} "
+            f"{'texts/sec':>11}"
+        )
+        for name, stage in stages.items():
+            stats = summarize(
+                time_calls(stage, iterations, warmup=warmup),
+                items_per_call=len(texts),
+            )
+            self.stdout.write(
+                f"{name:<12} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                f"{stats['p50_ms'] * 1000 / len(texts):>9.2f} "
+                f"{stats['items_per_sec']:>11.1f}"
+            )
+
+    @staticmethod
+    def _load_texts(path, count) -> list:
+        if path is None:
+            return (SAMPLE_TEXTS * (count // len(SAMPLE_TEXTS) + 1))[:count]
+
+        try:
+            rows = (row for chunk, _ in iter_row_chunks(path, 1000) for row in chunk)
+            texts = [row[0] for row in islice(rows, count) if row]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        if not texts:
+            raise CommandError(f"No texts in {path}")
+        return texts
+
+    @staticmethod
+    def _candidates(doc) -> set:
+        # the aspect candidates of a doc before filtering, the dedup input
+        candidates = {chunk.text.lower().strip() for chunk in doc.noun_chunks}
+        candidates.update(ent.text.lower().strip() for ent in doc.ents)
+        candidates.discard("")
+        return candidates
@@ -0,0 +1,129 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+
+from analyzer.backends import SAMPLE_PAIRS, sample_inputs
+from analyzer.benchmarking import percentile
+from analyzer.registry import ModelsUnavailable, registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Throughput of N concurrent inference processes for a matrix of torch "
+        "intra-op / inter-op threads, with and without core pinning."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--processes", nargs="+", type=int, default=[1, 2, 4])
+        parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4])
+        parser.add_argument("--interop-threads", nargs="+", type=int, default=[1])
+        parser.add_argument(
+            "--pin", choices=["off", "on", "both"], default="off", help="Core pinning"
+        )
+        parser.add_argument("--batch-size", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+
+    def handle(self, *args, **options) -> None:
+        # the workers are forked from this process and inherit the model; it
+        # must not run inference itself (OpenMP pools do not survive a fork)
+        try:
+            models = registry.get()
+        except ModelsUnavailable as e:
+            raise CommandError(str(e))
+
+        batch_size = options["batch_size"]
+        pairs = (SAMPLE_PAIRS * (batch_size // len(SAMPLE_PAIRS) + 1))[:batch_size]
+        inputs = sample_inputs(models.tokenizer, pairs)
+        pin_modes = {"off": [False], "on": [True], "both": [False, True]}
+        cores = (
+            len(os.sched_getaffinity(0))
+            if hasattr(os, "sched_getaffinity")
+            else os.cpu_count()
+        )
+
+        self.stdout.write(
+            f"🖥️  {cores} cores, batch size {batch_size}, {options['seconds']}s per run"
+        )
+        self.stdout.write(
+            f"{'procs':>5} {'intra':>5} {'inter':>5} {'pin':>4} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'pairs/sec':>10}"
+        )
+
+        context = multiprocessing.get_context("fork")
+        matrix = itertools.product(
+            options["processes"],
+            options["threads"],
+            options["interop_threads"],
+            pin_modes[options["pin"]],
+        )
+        for processes, intra_op, inter_op, pin in matrix:
+            results = context.Queue()
+            workers = [
+                context.Process(
+                    target=_run_worker,
+                    args=(
+                        slot,
+                        models.backend,
+                        inputs,
+                        intra_op,
+                        inter_op,
+                        pin,
+                        options["seconds"],
+                        results,
+                    ),
+                )
+                for slot in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+            try:
+                reports = [
+                    results.get(timeout=options["seconds"] + 60) for _ in workers
+                ]
+            except queue.Empty:
+                raise CommandError("A benchmark worker died, see its traceback.")
+            for worker in workers:
+                worker.join()
+
+            timings = [timing for report in reports for timing in report["timings"]]
+            pairs_per_sec = sum(
+                len(report["timings"]) * batch_size / report["seconds"]
+                for report in reports
+            )
+            self.stdout.write(
+                f"{processes:>5} {intra_op:>5} {inter_op:>5} "
+                f"{'on' if pin else 'off':>4} "
+                f"{percentile(timings, 50) * 1000:>9.2f} "
+                f"{percentile(timings, 95) * 1000:>9.2f} {pairs_per_sec:>10.1f}"
+            )
+
+
+def _run_worker(slot, backend, inputs, intra_op, inter_op, pin, seconds, results):
+    import torch
+
+    torch.set_num_threads(intra_op)
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError:
+        pass  # already started in this process, keep the default
+    if pin and hasattr(os, "sched_setaffinity"):
+        # fixed slot per worker (not runtime.pin_cores, whose slots may be
+        # held by running servers)
+        available = sorted(os.sched_getaffinity(0))
+        start = slot * intra_op % len(available)
+        os.sched_setaffinity(0, available[start : start + intra_op] or available)
+
+    backend.logits(inputs)  # warmup
+
+    timings = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        call_started = time.perf_counter()
+        backend.logits(inputs)
+        timings.append(time.perf_counter() - call_started)
+
+    results.put({"timings": timings, "seconds": time.perf_counter() - started})
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.metrics import accuracy_score, f1_score
+from transformers import AutoTokenizer
+
+import csv
+import gc
+import io
+import time
+import torch
+
+from analyzer.backends import load_torch_model
+from analyzer.benchmarking import current_rss_bytes, percentile
+from analyzer.services import ABSAService
+from analyzer.tokenization import encode_pairs, pad_features
+
+
+LABEL2ID = {label: idx for idx, label in ABSAService.ID2LABEL.items()}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare accuracy, macro-F1, latency, throughput and memory of the int8 "
+        "quantized model against fp32 on the MAMS validation CSV."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--data",
+            default="Data/mams_val_parsed.csv",
+            help="CSV with text, aspect and label columns "
+            "(written by Notebooks/download_data.py).",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=["dynamic", "artifact"],
+            default="dynamic",
+            help="Quantize at load time or load the quantize_model artifact.",
+        )
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument("--limit", type=int, default=0, help="0 = all rows")
+
+    def handle(self, *args, **options) -> None:
+        rows = self._read_rows(options["data"], options["limit"])
+        tokenizer = AutoTokenizer.from_pretrained(str(settings.ABSA_MODEL_PATH))
+        torch.set_grad_enabled(False)
+
+        # encode once, both models see exactly the same inputs
+        encodings = encode_pairs(
+            tokenizer,
+            [(ABSAService.clean_text(text), aspect) for text, aspect, _ in rows],
+        )
+        labels = [label for _, _, label in rows]
+
+        reports = {}
+        for name, quantization in [("fp32", ""), ("int8", options["mode"])]:
+            gc.collect()
+            rss_before = current_rss_bytes()
+            model = load_torch_model(quantization=quantization)
+            report = self._evaluate(
+                model, tokenizer, encodings, labels, options["batch_size"]
+            )
+            report["rss_mb"] = (current_rss_bytes() - rss_before) / 1024**2
+            report["size_mb"] = self._serialized_size(model) / 1024**2
+            reports[name] = report
+            del model
+
+        self._print_reports(reports, len(rows))
+
+    def _read_rows(self, path, limit) -> list:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = [
+                    (row["text"], row["aspect"], LABEL2ID[row["label"].lower()])
+                    for row in csv.DictReader(f)
+                ]
+        except FileNotFoundError:
+            raise CommandError(
+                f"{path} not found, run Notebooks/download_data.py first."
+            )
+        return rows[:limit] if limit else rows
+
+    def _evaluate(self, model, tokenizer, encodings, labels, batch_size) -> dict:
+        lengths = [len(input_ids) for input_ids in encodings["input_ids"]]
+        predictions = [None] * len(lengths)
+        timings = []
+
+        for batch in ABSAService.plan_batches(lengths, batch_size):
+            inputs = pad_features(tokenizer, encodings, batch)
+
+            started = time.perf_counter()
+            logits = model(**inputs).logits
+            timings.append(time.perf_counter() - started)
+
+            for idx, pred_id in zip(batch, logits.argmax(dim=1).tolist()):
+                predictions[idx] = pred_id
+
+        return {
+            "accuracy": accuracy_score(labels, predictions),
+            "macro_f1": f1_score(labels, predictions, average="macro"),
+            "p50_ms": percentile(timings, 50) * 1000,
+            "p95_ms": percentile(timings, 95) * 1000,
+            "pairs_per_sec": len(lengths) / sum(timings),
+        }
+
+    def _serialized_size(self, model) -> int:
+        buffer = io.BytesIO()
+        torch.save(model.state_dict(), buffer)
+        return buffer.tell()
+
+    def _print_reports(self, reports, count) -> None:
+        self.stdout.write(f"📊 {count} validation pairs")
+        self.stdout.write(
+            f"{'model':<6} {'accuracy':>9} {'macro-F1':>9} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'pairs/sec':>10} {'size MB':>8} {'RSS MB':>8}"
+        )
+        for name, r in reports.items():
+            self.stdout.write(
+                f"{name:<6} {r['accuracy']:>9.4f} {r['macro_f1']:>9.4f} "
+                f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['pairs_per_sec']:>10.1f} "
+                f"{r['size_mb']:>8.1f} {r['rss_mb']:>8.1f}"
+            )
+
+        fp32, int8 = reports["fp32"], reports["int8"]
+        self.stdout.write(
+            f"Δ int8 vs fp32: accuracy {int8['accuracy'] - fp32['accuracy']:+.4f}, "
+            f"macro-F1 {int8['macro_f1'] - fp32['macro_f1']:+.4f}, "
+            f"throughput x{int8['pairs_per_sec'] / fp32['pairs_per_sec']:.2f}, "
+            f"size x{int8['size_mb'] / fp32['size_mb']:.2f}"
+        )
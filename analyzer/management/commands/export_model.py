@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+import torch
+
+from analyzer.backends import (
+    PARITY_BATCHES,
+    OnnxRuntimeBackend,
+    TorchBackend,
+    TorchScriptBackend,
+    export_onnx,
+    export_torchscript,
+    max_logit_diff,
+    sample_inputs,
+)
+
+
+class Command(BaseCommand):
+    help = "Export the ABSA model to ONNX (optionally TorchScript) and check parity."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--onnx-path", default=str(settings.ABSA_ONNX_MODEL_PATH))
+        parser.add_argument("--opset", type=int, default=17)
+        parser.add_argument(
+            "--torchscript",
+            action="store_true",
+            help="Also write a traced TorchScript module.",
+        )
+        parser.add_argument(
+            "--torchscript-path", default=str(settings.ABSA_TORCHSCRIPT_MODEL_PATH)
+        )
+        parser.add_argument(
+            "--atol",
+            type=float,
+            default=1e-4,
+            help="Max absolute logit difference allowed against PyTorch.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        model_path = str(settings.ABSA_MODEL_PATH)
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+        reference = TorchBackend(model, torch.device("cpu"))
+
+        self.stdout.write(f"📦 Exporting ONNX graph to {options['onnx_path']}")
+        export_onnx(model, tokenizer, options["onnx_path"], opset=options["opset"])
+        exported = [("onnx", OnnxRuntimeBackend(options["onnx_path"]))]
+
+        if options["torchscript"]:
+            path = options["torchscript_path"]
+            self.stdout.write(f"📦 Tracing TorchScript to {path}")
+            export_torchscript(model, tokenizer, path)
+            exported.append(("torchscript", TorchScriptBackend(path)))
+
+        # parity check against the eager PyTorch logits, on the traced shape
+        # and on batches of other sizes and padded lengths
+        for name, backend in exported:
+            diffs = []
+            for pairs in PARITY_BATCHES:
+                shape = tuple(sample_inputs(tokenizer, pairs)["input_ids"].shape)
+                try:
+                    diff = max_logit_diff(reference, backend, tokenizer, pairs)
+                except Exception as e:
+                    raise CommandError(f"{name} failed on a {shape} batch: {e}")
+                if diff > options["atol"]:
+                    raise CommandError(
+                        f"{name} logits differ from PyTorch by {diff:.2e} on a "
+                        f"{shape} batch (> {options['atol']:.0e})"
+                    )
+                diffs.append(diff)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ {name} parity OK on {len(diffs)} batch shapes "
+                    f"(max diff {max(diffs):.2e})"
+                )
+            )
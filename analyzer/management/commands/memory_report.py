@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import os
+
+from analyzer.benchmarking import process_memory
+
+
+class Command(BaseCommand):
+    help = (
+        "Report unique vs shared memory of the running web and Celery worker "
+        "processes (Linux, reads /proc/<pid>/smaps_rollup)."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--pids", nargs="+", type=int, help="Processes to report (default: match)"
+        )
+        parser.add_argument(
+            "--match",
+            nargs="+",
+            default=["gunicorn", "uvicorn", "celery", "runserver"],
+            help="Report processes whose command line contains any of these.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        pids = options["pids"] or self._matching_pids(options["match"])
+        if not pids:
+            raise CommandError("No matching processes found.")
+
+        self.stdout.write(
+            f"{'pid':>7} {'rss MB':>9} {'pss MB':>9} {'unique MB':>10} "
+            f"{'shared MB':>10}  command"
+        )
+
+        totals = dict.fromkeys(["rss", "pss", "unique", "shared"], 0)
+        for pid in pids:
+            try:
+                memory = process_memory(pid)
+                command = self._command_line(pid)
+            except OSError as e:
+                self.stderr.write(f"{pid:>7} skipped: {e}")
+                continue
+
+            for key in totals:
+                totals[key] += memory[key]
+            self.stdout.write(
+                f"{pid:>7} {self._mb(memory['rss']):>9.1f} "
+                f"{self._mb(memory['pss']):>9.1f} {self._mb(memory['unique']):>10.1f} "
+                f"{self._mb(memory['shared']):>10.1f}  {command[:60]}"
+            )
+
+        # summed RSS counts shared pages once per process, summed PSS does not
+        self.stdout.write(
+            f"{'total':>7} {self._mb(totals['rss']):>9.1f} "
+            f"{self._mb(totals['pss']):>9.1f} {self._mb(totals['unique']):>10.1f} "
+            f"{self._mb(totals['shared']):>10.1f}"
+        )
+        self.stdout.write(
+            f"📦 Actual footprint (sum of PSS): {self._mb(totals['pss']):.1f} MB, "
+            f"sum of RSS would suggest {self._mb(totals['rss']):.1f} MB"
+        )
+
+    def _matching_pids(self, patterns) -> list:
+        pids = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit() or int(entry) == os.getpid():
+                continue
+            try:
+                command = self._command_line(entry)
+            except OSError:
+                continue
+            if any(pattern in command for pattern in patterns):
+                pids.append(int(entry))
+        return sorted(pids)
+
+    @staticmethod
+    def _command_line(pid) -> str:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\x00", b" ").decode(errors="replace").strip()
+
+    @staticmethod
+    def _mb(value) -> float:
+        return value / 1024**2
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import os
+import torch
+
+from analyzer.backends import load_torch_model, quantize_model
+
+
+class Command(BaseCommand):
+    help = "Save a dynamic int8 quantized copy of the ABSA model for CPU serving."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--output", default=str(settings.ABSA_QUANTIZED_MODEL_PATH))
+
+    def handle(self, *args, **options) -> None:
+        model = load_torch_model(quantization="")
+        quantized = quantize_model(model)
+
+        torch.save(quantized.state_dict(), options["output"])
+
+        size_mb = os.path.getsize(options["output"]) / 1024**2
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Saved int8 weights to {options['output']} ({size_mb:.1f} MB). "
+                f'Set ABSA_QUANTIZATION = "artifact" to serve them.'
+            )
+        )
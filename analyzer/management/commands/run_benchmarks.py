@@ -0,0 +1,318 @@
+from contextlib import ExitStack, redirect_stdout
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+import csv
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+
+from analyzer.benchmark_suite import (
+    build_spacy_pipeline,
+    build_tiny_model,
+    compare,
+    load_results,
+    synthetic_reviews,
+)
+from analyzer.benchmarking import peak_rss_bytes, summarize
+from analyzer.models import AnalysisSession
+from analyzer.registry import registry
+from analyzer.services import ABSAService
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline, reproducible benchmark of the inference and persistence paths "
+        "(tiny random BERT, random spaCy pipeline, synthetic reviews, throwaway "
+        "test database). Writes JSON and optionally compares it to a baseline."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("--output", help="Write the results as JSON here")
+        parser.add_argument("--baseline", help="Results JSON to compare against")
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Relative change for the worse reported as regression (0.2=20%%)",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument("--texts", type=int, default=200, help="Single-text runs")
+        parser.add_argument("--rows", type=int, default=2000, help="Bulk CSV rows")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--depths",
+            nargs="+",
+            type=int,
+            default=[1, 10, 30],
+            help="Result pages to time (1 = first page)",
+        )
+        parser.add_argument("--requests", type=int, default=20, help="Per depth")
+
+    def handle(self, *args, **options) -> None:
+        if registry.ready:
+            raise CommandError("Models already loaded in this process.")
+
+        with ExitStack() as stack:
+            workdir = stack.enter_context(tempfile.TemporaryDirectory())
+            quiet = stack.enter_context(io.StringIO())
+
+            self.stdout.write("🔧 Building the benchmark model and spaCy pipeline...")
+            with redirect_stdout(quiet):
+                build_tiny_model(f"{workdir}/model", options["seed"])
+                build_spacy_pipeline(f"{workdir}/spacy", options["seed"])
+
+            stack.enter_context(self._settings(workdir, options["threads"]))
+            stack.enter_context(self._eager_celery())
+
+            # throwaway database, the configured one is never written to
+            database_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            stack.callback(
+                connection.creation.destroy_test_db, database_name, verbosity=0
+            )
+
+            results = {
+                "meta": self._meta(options),
+                "metrics": self._run(options, quiet),
+            }
+
+        self._report(results)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"💾 Results written to {options['output']}")
+
+        if options["baseline"]:
+            self._compare(results, options["baseline"], options["tolerance"])
+
+    def _run(self, options, quiet) -> dict:
+        seed = options["seed"]
+        metrics = {}
+
+        with redirect_stdout(quiet):
+            started = time.perf_counter()
+            registry.load()
+            metrics["model_load_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+        # single text, the synchronous text endpoint's pipeline
+        texts = synthetic_reviews(options["texts"], seed + 1)
+        with redirect_stdout(quiet):
+            ABSAService.analyze_sentiment(texts[0])  # warmup
+            timings = []
+            for text in texts:
+                started = time.perf_counter()
+                ABSAService.analyze_sentiment(text)
+                timings.append(time.perf_counter() - started)
+        stats = summarize(timings)
+        metrics["single_text"] = {
+            key: stats[key] for key in ["p50_ms", "p95_ms", "p99_ms", "mean_ms"]
+        }
+        metrics["single_text"]["texts_per_sec"] = stats["items_per_sec"]
+        self.stdout.write(f"   single text: p50 {stats['p50_ms']:.2f} ms")
+
+        # bulk upload through the API, process_bulk_file runs eagerly inside
+        user = User.objects.create_user(username="benchmark")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rows = synthetic_reviews(options["rows"], seed + 2)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["text"])
+        writer.writerows([row] for row in rows)
+        upload = SimpleUploadedFile(
+            "reviews.csv", buffer.getvalue().encode(), content_type="text/csv"
+        )
+
+        with redirect_stdout(quiet):
+            started = time.perf_counter()
+            response = client.post("/api/sessions/", {"csv_file": upload})
+            seconds = time.perf_counter() - started
+        session = AnalysisSession.objects.get(id=response.data["id"])
+        if session.status != "Completed" or session.records.count() != len(rows):
+            raise CommandError(
+                f"Bulk run did not complete: {session.status}, "
+                f"{session.records.count()} of {len(rows)} rows"
+            )
+        metrics["bulk"] = {
+            "rows_per_sec": round(len(rows) / seconds, 2),
+            "total_ms": round(seconds * 1000, 3),
+        }
+        self.stdout.write(f"   bulk: {len(rows) / seconds:.1f} rows/sec")
+
+        # session results, a cursor walk to each requested page depth
+        metrics["retrieve"] = self._retrieve(client, session.id, options)
+
+        metrics["peak_rss_mb"] = round(peak_rss_bytes() / 1024**2, 1)
+        return metrics
+
+    def _retrieve(self, client, session_id, options) -> dict:
+        url = f"/api/sessions/{session_id}/"
+        params = {"page_size": options["page_size"]}
+
+        page_urls = []
+        next_url = url
+        while next_url and len(page_urls) < max(options["depths"]):
+            page_urls.append(next_url)
+            response = client.get(next_url, params if next_url == url else None)
+            if response.status_code != 200:
+                raise CommandError(f"Retrieve failed: {response.status_code}")
+            next_url = response.data["next"]
+
+        results = {}
+        for depth in options["depths"]:
+            if depth > len(page_urls):
+                self.stderr.write(f"   skipping page {depth}: only {len(page_urls)}")
+                continue
+
+            page_url = page_urls[depth - 1]
+            timings = []
+            for _ in range(options["requests"]):
+                started = time.perf_counter()
+                client.get(page_url, params if page_url == url else None)
+                timings.append(time.perf_counter() - started)
+
+            stats = summarize(timings)
+            results[f"page_{depth}"] = {
+                "p50_ms": stats["p50_ms"],
+                "p95_ms": stats["p95_ms"],
+            }
+            self.stdout.write(
+                f"   retrieve page {depth}: p50 {stats['p50_ms']:.2f} ms"
+            )
+        return results
+
+    @staticmethod
+    def _settings(workdir, threads):
+        # only the paths measured: no result cache, memo, batching window,
+        # sharding or profiling sampling between runs
+        return override_settings(
+            ABSA_MODEL_PATH=f"{workdir}/model",
+            ABSA_SPACY_MODEL=f"{workdir}/spacy",
+            ABSA_INFERENCE_BACKEND="torch",
+            ABSA_QUANTIZATION=None,
+            ABSA_RESULT_CACHE={"BACKEND": None},
+            ABSA_PAIR_MEMO={"ENABLED": False},
+            ABSA_BATCHING={"ENABLED": False},
+            ABSA_SHARDING={"ENABLED": False},
+            ABSA_PROFILING={"ENABLED": False},
+            ABSA_SHARED_WEIGHTS={"PRELOAD": False, "MMAP": False},
+            ABSA_PROGRESS={**settings.ABSA_PROGRESS, "CACHE_ALIAS": None},
+            ABSA_RUNTIME={
+                **settings.ABSA_RUNTIME,
+                "management": {
+                    "INTRA_OP": threads,
+                    "INTER_OP": 1,
+                    "TOKENIZERS_PARALLELISM": False,
+                },
+            },
+            MEDIA_ROOT=f"{workdir}/media",
+            ALLOWED_HOSTS=["testserver"],
+        )
+
+    @staticmethod
+    def _eager_celery():
+        # tasks run inline; eager calls still open a producer and a result
+        # backend, the in-memory ones (Celery reads these variables before
+        # its configuration) keep that offline
+        from ABSAapi.celery import app
+
+        stack = ExitStack()
+        overrides = {
+            "CELERY_BROKER_URL": "memory://",
+            "CELERY_RESULT_BACKEND": "cache+memory://",
+        }
+        for name, value in overrides.items():
+            stack.callback(_restore_environ, name, os.environ.get(name))
+            os.environ[name] = value
+
+        always_eager = app.conf.task_always_eager
+        app.conf.task_always_eager = True
+        stack.callback(setattr, app.conf, "task_always_eager", always_eager)
+        return stack
+
+    @staticmethod
+    def _meta(options) -> dict:
+        import django
+        import torch
+        import transformers
+
+        return {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "django": django.get_version(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+            "database": connection.vendor,
+            "options": {
+                key: options[key]
+                for key in [
+                    "seed",
+                    "threads",
+                    "texts",
+                    "rows",
+                    "page_size",
+                    "depths",
+                    "requests",
+                ]
+            },
+        }
+
+    def _report(self, results) -> None:
+        metrics = results["metrics"]
+        self.stdout.write(
+            f"📊 single text p50 {metrics['single_text']['p50_ms']:.2f} ms / "
+            f"p95 {metrics['single_text']['p95_ms']:.2f} ms, bulk "
+            f"{metrics['bulk']['rows_per_sec']:.1f} rows/sec, peak RSS "
+            f"{metrics['peak_rss_mb']:.1f} MB"
+        )
+
+    def _compare(self, results, path, tolerance) -> None:
+        try:
+            baseline = load_results(path)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read baseline {path}: {e}")
+
+        if baseline.get("meta", {}).get("options") != results["meta"]["options"]:
+            self.stderr.write("⚠️  Baseline was run with different options.")
+
+        self.stdout.write(
+            f"{'metric':<28} {'baseline':>12} {'current':>12} {'change':>8}"
+        )
+        regressions = []
+        for metric, before, after, change, regressed in compare(
+            results, baseline, tolerance
+        ):
+            flag = "  ❌ regression" if regressed else ""
+            self.stdout.write(
+                f"{metric:<28} {before:>12.2f} {after:>12.2f} {change:>+8.1%}{flag}"
+            )
+            if regressed:
+                regressions.append(metric)
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} regression(s) beyond {tolerance:.0%}: "
+                + ", ".join(regressions)
+            )
+        self.stdout.write(f"✅ No regressions beyond {tolerance:.0%}")
+
+
+def _restore_environ(name, value) -> None:
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0002_session_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('start_offset', models.BigIntegerField()),
+                ('end_offset', models.BigIntegerField()),
+                ('start_row', models.IntegerField()),
+                ('rows', models.IntegerField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Processing', 'Processing'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'ordering': ['session', 'index'],
+            },
+        ),
+        migrations.AddField(
+            model_name='analysisrecord',
+            name='source_row',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='analysisrecord',
+            index=models.Index(fields=['session', 'source_row'], name='analyzer_an_session_731172_idx'),
+        ),
+        migrations.AddField(
+            model_name='bulkshard',
+            name='session',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='analyzer.analysissession'),
+        ),
+        migrations.AddConstraint(
+            model_name='bulkshard',
+            constraint=models.UniqueConstraint(fields=('session', 'index'), name='unique_shard_per_session'),
+        ),
+    ]
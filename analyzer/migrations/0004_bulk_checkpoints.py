@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0003_bulk_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysissession',
+            name='checkpoint_offset',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analysissession',
+            name='checkpoint_row',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkshard',
+            name='checkpoint_offset',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulkshard',
+            name='checkpoint_row',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0004_bulk_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysissession',
+            name='session_type',
+            field=models.CharField(choices=[('TEXT', 'Raw Text'), ('FILE', 'CSV File'), ('BATCH', 'Text Batch')], max_length=10),
+        ),
+    ]
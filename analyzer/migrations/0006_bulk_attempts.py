@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0005_batch_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysissession',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0006_bulk_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysissession',
+            name='shards_dispatched',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,12 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 # Create your models here.
 class AnalysisSession(models.Model):
-    SESSION_TYPES = [("TEXT", "Raw Text"), ("FILE", "CSV File")]
+    SESSION_TYPES = [
+        ("TEXT", "Raw Text"),
+        ("FILE", "CSV File"),
+        ("BATCH", "Text Batch"),
+    ]
     STATUS_CHOICES = [
         ("Pending", "Pending"),
+        ("Processing", "Processing"),
         ("Completed", "Completed"),
         ("Failed", "Failed"),
     ]
@@ -19,9 +25,46 @@ class AnalysisSession(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
     total_items = models.IntegerField(default=0)
 
+    # bulk progress (total_rows is estimated from the file until it finishes)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # bulk checkpoint: csv byte offset (0 for text batches) and data row the
+    # job resumes from, committed together with the records before it
+    checkpoint_offset = models.BigIntegerField(default=0)
+    checkpoint_row = models.IntegerField(default=0)
+    # deliveries of the bulk task, capped by ABSA_BULK_MAX_ATTEMPTS
+    attempts = models.IntegerField(default=0)
+    # set once the shard tasks of a sharded session are sent
+    shards_dispatched = models.BooleanField(default=False)
+
     def __str__(self) -> str:
         return f"Session {self.id} ({self.session_type})"
 
+    def save_checkpoint(self, offset, row) -> None:
+        self.checkpoint_offset = offset
+        self.checkpoint_row = row
+        self.save(update_fields=["checkpoint_offset", "checkpoint_row"])
+
+    @property
+    def rows_per_second(self) -> float | None:
+        if self.started_at is None or not self.processed_rows:
+            return None
+        finished_at = self.finished_at or timezone.now()
+        elapsed = (finished_at - self.started_at).total_seconds()
+        return round(self.processed_rows / elapsed, 2) if elapsed > 0 else None
+
+    @property
+    def eta_seconds(self) -> float | None:
+        if self.finished_at is not None:
+            return 0.0
+        rate = self.rows_per_second
+        if not rate or self.total_rows <= self.processed_rows:
+            return None
+        return round((self.total_rows - self.processed_rows) / rate, 1)
+
 
 class AnalysisRecord(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="analyses")
@@ -30,11 +73,70 @@ class AnalysisRecord(models.Model):
     )
     original_text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # data row of the uploaded csv (from 0, header excluded) or index in a
+    # text batch, None for text
+    source_row = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["session", "source_row"])]
 
     def __str__(self) -> str:
         return f"{self.user.username} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
 
 
+class BulkShard(models.Model):
+    # byte range [start_offset, end_offset) of a session's csv, processed by
+    # its own Celery task; it holds data rows start_row .. start_row + rows
+    STATUS_CHOICES = [
+        ("Pending", "Pending"),
+        ("Processing", "Processing"),
+        ("Completed", "Completed"),
+        ("Failed", "Failed"),
+    ]
+
+    session = models.ForeignKey(
+        AnalysisSession, related_name="shards", on_delete=models.CASCADE
+    )
+    index = models.IntegerField()
+    start_offset = models.BigIntegerField()
+    end_offset = models.BigIntegerField()
+    start_row = models.IntegerField()
+    rows = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
+    processed_rows = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    # resume point within the shard, see AnalysisSession.checkpoint_offset
+    checkpoint_offset = models.BigIntegerField(default=0)
+    checkpoint_row = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["session", "index"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session", "index"], name="unique_shard_per_session"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"Session {self.session_id} shard {self.index} ({self.status})"
+
+    def save_checkpoint(self, offset, row) -> None:
+        self.checkpoint_offset = offset
+        self.checkpoint_row = row
+        self.processed_rows = row - self.start_row
+        self.save(
+            update_fields=["checkpoint_offset", "checkpoint_row", "processed_rows"]
+        )
+
+    def records(self):
+        return AnalysisRecord.objects.filter(
+            session_id=self.session_id,
+            source_row__gte=self.start_row,
+            source_row__lt=self.start_row + self.rows,
+        )
+
+
 class AspectResult(models.Model):
     record = models.ForeignKey(
         AnalysisRecord, related_name="results", on_delete=models.CASCADE
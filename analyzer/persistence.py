@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .models import AnalysisRecord, AspectResult
+
+
+def save_analysis_results(
+    session, ai_results, batch_size=None, source_rows=None
+) -> list:
+    # write records and their aspects with bulk_create, one transaction per
+    # batch so a commit (and fsync) covers many rows instead of one.
+    # source_rows are the csv rows of bulk results (see AnalysisRecord)
+    if batch_size is None:
+        batch_size = getattr(settings, "ABSA_DB_BATCH_SIZE", 500)
+
+    db = router.db_for_write(AnalysisRecord)
+    saved_records = []
+
+    for start in range(0, len(ai_results), batch_size):
+        batch = ai_results[start : start + batch_size]
+        batch_rows = source_rows[start : start + batch_size] if source_rows else None
+
+        with transaction.atomic(using=db):
+            records = _create_records(session, batch, db, batch_rows)
+
+            # records now have their PKs, so the aspects can point at them
+            aspects = [
+                AspectResult(
+                    record=record,
+                    aspect=item["aspect"],
+                    sentiment=item["sentiment"],
+                    confidence=item["confidence"],
+                )
+                for record, ai_result in zip(records, batch)
+                for item in ai_result["analysis"]
+            ]
+            AspectResult.objects.using(db).bulk_create(aspects, batch_size=batch_size)
+
+        saved_records.extend(records)
+
+    return saved_records
+
+
+def _create_records(session, batch, db, source_rows=None) -> list:
+    records = [
+        AnalysisRecord(
+            user_id=session.user_id,
+            session=session,
+            original_text=ai_result["original_text"],
+            source_row=source_row,
+        )
+        for ai_result, source_row in zip(batch, source_rows or [None] * len(batch))
+    ]
+
+    # backends with INSERT ... RETURNING (PostgreSQL, SQLite 3.35+, MariaDB)
+    # hand the new PKs back from a single bulk insert
+    if connections[db].features.can_return_rows_from_bulk_insert:
+        return AnalysisRecord.objects.using(db).bulk_create(records)
+
+    # fallback (e.g. MySQL): per-row inserts, still inside the batch transaction
+    for record in records:
+        record.save(using=db)
+    return records
@@ -0,0 +1,296 @@
+from asgiref.sync import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.decorators import sync_and_async_middleware
+from functools import partial
+
+import bisect
+import random
+import threading
+import time
+
+
+# Stages of the inference pipeline, as timed by stage() ("tokenize" and
+# "forward" run inside "inference"; "total" is the whole request or chunk)
+STAGES = (
+    "clean",
+    "parse",
+    "aspects",
+    "inference",
+    "tokenize",
+    "forward",
+    "aggregate",
+    "db_write",
+    "total",
+)
+# what a trace covers: one HTTP request, or one chunk of a bulk job
+SCOPES = ("request", "bulk")
+# probes and scrapes, not traced
+UNTRACED_PATHS = {"/healthz", "/readyz", "/metrics"}
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# trace of the request / chunk being processed, None when it is not sampled
+_current_trace = ContextVar("absa_trace", default=None)
+
+
+def profiling_config() -> dict:
+    return getattr(settings, "ABSA_PROFILING", {})
+
+
+class Trace:
+    def __init__(self, scope) -> None:
+        self.scope = scope
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def add(self, name, seconds) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def trace(scope):
+    # Sample SAMPLE_RATE of the requests / chunks: those get a Trace that
+    # stage() adds to, observed into the stage histograms at the end. The
+    # others (and everything when disabled) only pay for this check.
+    config = profiling_config()
+    if not config.get("ENABLED") or random.random() >= config.get("SAMPLE_RATE", 1.0):
+        yield None
+        return
+
+    current = Trace(scope)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        current.add("total", time.perf_counter() - current.started)
+        get_profiler().observe(scope, current.stages)
+
+
+@contextmanager
+def stage(name):
+    current = _current_trace.get()
+    if current is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, time.perf_counter() - started)
+
+
+_EXHAUSTED = object()
+
+
+def timed_iter(iterable, name):
+    # times each step of a lazy iterator (e.g. nlp.pipe) as stage `name`
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            item = next(iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def shared_stages(traces):
+    # Stages timed in this block are added to every trace of `traces`: the
+    # batching worker runs one batch for several requests, each of which
+    # waited for all of it. None entries (not sampled) are skipped.
+    traces = [current for current in traces if current is not None]
+    if not traces:
+        yield
+        return
+
+    batch = Trace("batch")
+    token = _current_trace.set(batch)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+        for current in traces:
+            for name, seconds in batch.stages.items():
+                current.add(name, seconds)
+
+
+def in_trace(fn):
+    # fn bound to the current context, for executor threads (which do not
+    # inherit context variables) so its stages land in this trace
+    return partial(copy_context().run, fn)
+
+
+class Histogram:
+    def __init__(self, buckets) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.total = 0.0
+
+    def observe(self, seconds) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+
+
+class StageProfiler:
+    # (scope, stage) -> Histogram of this process
+    def __init__(self, buckets) -> None:
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, scope, stages) -> None:
+        with self._lock:
+            for name, seconds in stages.items():
+                histogram = self._histograms.get((scope, name))
+                if histogram is None:
+                    histogram = self._histograms[(scope, name)] = Histogram(
+                        self.buckets
+                    )
+                histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        # (scope, stage) -> (bucket counts, sum of seconds)
+        with self._lock:
+            return {
+                key: (list(histogram.counts), histogram.total)
+                for key, histogram in self._histograms.items()
+            }
+
+
+class SharedStageProfiler(StageProfiler):
+    # Same histograms kept as counters in a Django cache shared by the web
+    # and Celery processes (e.g. Redis), so /metrics of any web process
+    # reports every process, bulk workers included. Sums are stored in
+    # microseconds since cache.incr() only takes integers.
+    def __init__(self, buckets, alias) -> None:
+        super().__init__(buckets)
+        self.cache = caches[alias]
+
+    def key(self, scope, name, field) -> str:
+        return f"absa:stages:{scope}:{name}:{field}"
+
+    def observe(self, scope, stages) -> None:
+        for name, seconds in stages.items():
+            bucket = bisect.bisect_left(self.buckets, seconds)
+            self._incr(self.key(scope, name, bucket))
+            self._incr(self.key(scope, name, "sum_us"), round(seconds * 1e6))
+
+    def snapshot(self) -> dict:
+        fields = list(range(len(self.buckets) + 1)) + ["sum_us"]
+        keys = [
+            self.key(scope, name, field)
+            for scope in SCOPES
+            for name in STAGES
+            for field in fields
+        ]
+        values = self.cache.get_many(keys)
+
+        snapshot = {}
+        for scope in SCOPES:
+            for name in STAGES:
+                counts = [
+                    values.get(self.key(scope, name, field), 0)
+                    for field in fields[:-1]
+                ]
+                if any(counts):
+                    total = values.get(self.key(scope, name, "sum_us"), 0) / 1e6
+                    snapshot[(scope, name)] = (counts, total)
+        return snapshot
+
+    def _incr(self, key, delta=1) -> None:
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # first observation; another process may have created it meanwhile
+            if not self.cache.add(key, delta, timeout=None):
+                self.cache.incr(key, delta)
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+    # process-wide profiler, shared through the cache with CACHE_ALIAS
+    global _profiler
+
+    with _profiler_lock:
+        if _profiler is None:
+            config = profiling_config()
+            buckets = sorted(config.get("BUCKETS") or DEFAULT_BUCKETS)
+            alias = config.get("CACHE_ALIAS")
+            if alias:
+                _profiler = SharedStageProfiler(buckets, alias)
+            else:
+                _profiler = StageProfiler(buckets)
+
+    return _profiler
+
+
+def render_metrics() -> str:
+    # Prometheus text exposition format (version 0.0.4)
+    profiler = get_profiler()
+    name = "absa_stage_duration_seconds"
+    lines = [
+        f"# HELP {name} Time spent per inference pipeline stage (sampled).",
+        f"# TYPE {name} histogram",
+    ]
+    for (scope, stage_name), (counts, total) in sorted(profiler.snapshot().items()):
+        labels = f'scope="{scope}",stage="{stage_name}"'
+        cumulative = 0
+        for bound, count in zip(profiler.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(current) -> str:
+    # Server-Timing header value, durations in milliseconds
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.2f}" for name, seconds in current.stages.items()
+    )
+
+
+@sync_and_async_middleware
+def stage_timing_middleware(get_response):
+    # Opens the (sampled) trace of every request and, with SERVER_TIMING,
+    # reports its stages to the client in a Server-Timing header.
+    def finish(response, current):
+        if current is not None and profiling_config().get("SERVER_TIMING"):
+            response["Server-Timing"] = server_timing(current)
+        return response
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            if request.path in UNTRACED_PATHS:
+                return await get_response(request)
+            with trace("request") as current:
+                response = await get_response(request)
+            return finish(response, current)
+
+    else:
+
+        def middleware(request):
+            if request.path in UNTRACED_PATHS:
+                return get_response(request)
+            with trace("request") as current:
+                response = get_response(request)
+            return finish(response, current)
+
+    return middleware
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+import time
+
+from .models import AnalysisSession
+
+
+# session fields mirrored in the progress cache
+PROGRESS_FIELDS = [
+    "status",
+    "total_rows",
+    "processed_rows",
+    "started_at",
+    "finished_at",
+]
+
+
+def progress_cache():
+    # Django cache holding live progress counters, None when disabled
+    alias = getattr(settings, "ABSA_PROGRESS", {}).get("CACHE_ALIAS")
+    return caches[alias] if alias else None
+
+
+def progress_key(session_id) -> str:
+    return f"absa:progress:{session_id}"
+
+
+def cached_progress(session_id) -> dict | None:
+    cache = progress_cache()
+    return cache.get(progress_key(session_id)) if cache is not None else None
+
+
+def apply_cached_progress(session) -> AnalysisSession:
+    # overlay the live counter on a session loaded from the DB, whose row is
+    # only written every DB_INTERVAL seconds while it runs
+    snapshot = cached_progress(session.id)
+    if snapshot is not None and snapshot["processed_rows"] >= session.processed_rows:
+        for field in PROGRESS_FIELDS:
+            setattr(session, field, snapshot[field])
+    return session
+
+
+def session_from_progress(session_id, snapshot) -> AnalysisSession:
+    # unsaved session carrying a cached snapshot, for serializers
+    return AnalysisSession(
+        id=session_id,
+        user_id=snapshot["user_id"],
+        **{field: snapshot[field] for field in PROGRESS_FIELDS},
+    )
+
+
+class ProgressTracker:
+    # Progress of one bulk session. The counter in the progress cache (if
+    # any) is refreshed on every advance; the session row is written with
+    # update_fields, at most every DB_INTERVAL seconds, and at start/finish.
+    def __init__(self, session, db_interval=None) -> None:
+        config = getattr(settings, "ABSA_PROGRESS", {})
+        if db_interval is None:
+            db_interval = config.get("DB_INTERVAL", 2.0)
+
+        self.session = session
+        self.db_interval = db_interval
+        self.cache = progress_cache()
+        self.cache_timeout = config.get("CACHE_TIMEOUT", 24 * 60 * 60)
+        self._last_write = 0.0
+
+    def start(self, total_rows, processed_rows=0) -> None:
+        # processed_rows > 0 when resuming from a checkpoint, the job then
+        # keeps its original start time
+        self.session.status = "Processing"
+        self.session.total_rows = total_rows
+        self.session.processed_rows = processed_rows
+        if not processed_rows or self.session.started_at is None:
+            self.session.started_at = timezone.now()
+        self.session.finished_at = None
+        self._write(PROGRESS_FIELDS)
+
+    def advance(self, rows) -> None:
+        self.session.processed_rows += rows
+
+        if time.monotonic() - self._last_write >= self.db_interval:
+            self._write(["processed_rows"])
+        else:
+            self._publish()
+
+    def finish(self, status) -> None:
+        self.session.status = status
+        self.session.finished_at = timezone.now()
+        fields = ["status", "processed_rows", "finished_at"]
+
+        if status == "Completed":
+            # the estimate is replaced by the rows actually read
+            self.session.total_rows = self.session.processed_rows
+            self.session.total_items = self.session.processed_rows
+            fields += ["total_rows", "total_items"]
+
+        self._write(fields)
+
+    def _write(self, fields) -> None:
+        self.session.save(update_fields=fields)
+        self._last_write = time.monotonic()
+        self._publish()
+
+    def _publish(self) -> None:
+        if self.cache is None:
+            return
+
+        snapshot = {field: getattr(self.session, field) for field in PROGRESS_FIELDS}
+        snapshot["user_id"] = self.session.user_id
+        self.cache.set(
+            progress_key(self.session.id), snapshot, timeout=self.cache_timeout
+        )
+
+
+class ShardProgressTracker(ProgressTracker):
+    # Progress of one shard of a sharded session. Several workers advance the
+    # same session, so its counter is bumped with F() increments of the rows
+    # done since the last write (still throttled), and the cache counter is
+    # not used: it cannot be updated atomically across shards.
+    def __init__(self, session, db_interval=None) -> None:
+        super().__init__(session, db_interval)
+        self.cache = None
+        self._pending = 0
+
+    def advance(self, rows) -> None:
+        self._pending += rows
+        if time.monotonic() - self._last_write >= self.db_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self.add(self._pending)
+        self._pending = 0
+        self._last_write = time.monotonic()
+
+    def add(self, rows) -> None:
+        if rows:
+            AnalysisSession.objects.filter(pk=self.session.pk).update(
+                processed_rows=F("processed_rows") + rows
+            )
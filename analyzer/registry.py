@@ -0,0 +1,230 @@
+from contextlib import contextmanager
+from django.conf import settings
+
+import gc
+import os
+import threading
+import time
+
+
+# reference point for the cold start (boot -> models ready) of this process
+PROCESS_STARTED = time.monotonic()
+
+
+class ModelsUnavailable(RuntimeError):
+    pass
+
+
+class ModelRegistry:
+    # Owns the inference components of this process (spaCy, tokenizer, eager
+    # model and inference backend). They are loaded once, on first use or by
+    # a background thread started at boot, and only ever from local files.
+    def __init__(self) -> None:
+        self.nlp = None
+        self.tokenizer = None
+        self.bert_model = None
+        self.device = None
+        self.backend = None
+
+        self.state = "idle"  # idle -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = {}
+        self.cold_start_seconds = None
+        self._lock = threading.Lock()  # held for the whole load
+        self._start_lock = threading.Lock()  # only guards starting the thread
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def get(self):
+        # the loaded registry, loading it in the calling thread if needed
+        if not self.ready:
+            self.load()
+        return self
+
+    def start(self) -> None:
+        # load in a daemon thread so the process can serve /healthz meanwhile;
+        # never waits for a load in progress (/readyz calls this)
+        with self._start_lock:
+            if self.ready or self._lock.locked():
+                return
+            if self._thread and self._thread.is_alive():
+                return
+            self.state = "loading"
+            self._thread = threading.Thread(
+                target=self._load_quietly, name="absa-model-loader", daemon=True
+            )
+            self._thread.start()
+
+    def load(self) -> None:
+        with self._lock:
+            if self.ready:
+                return
+
+            self.state = "loading"
+            try:
+                self._load()
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                print(f"❌ Error loading models: {e}")
+                raise ModelsUnavailable(f"AI models are not available: {e}") from e
+
+            self.state = "ready"
+            self.error = None
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "load_seconds": {
+                name: round(seconds, 3) for name, seconds in self.load_seconds.items()
+            },
+            "cold_start_seconds": round(self.cold_start_seconds, 3)
+            if self.cold_start_seconds is not None
+            else None,
+        }
+
+    def _load_quietly(self) -> None:
+        try:
+            self.load()
+        except ModelsUnavailable:
+            pass  # already reported, /readyz shows the error
+
+    def _load(self) -> None:
+        # heavy imports stay out of Django startup (management commands, beat)
+        from transformers import AutoTokenizer
+
+        import spacy
+        import torch
+
+        from .backends import create_backend, load_torch_model
+        from .runtime import ensure_runtime
+
+        ensure_runtime()
+        print("🤖 Loading AI Models...")
+        started = time.monotonic()
+        self.load_seconds = {}
+
+        # path to the model folder
+        model_path = str(settings.ABSA_MODEL_PATH)
+        print(f"   📂 Looking for model at: {model_path}")
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model folder not found at {model_path}")
+
+        with self._timed("tokenizer"):
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                model_path, local_files_only=True
+            )
+
+        backend_name = getattr(settings, "ABSA_INFERENCE_BACKEND", "torch")
+        if backend_name == "torch":
+            with self._timed("model"):
+                self.bert_model = load_torch_model(model_path)
+
+                # setup GPU/CPU (int8 quantized models only run on CPU)
+                use_cuda = torch.cuda.is_available() and not getattr(
+                    settings, "ABSA_QUANTIZATION", None
+                )
+                self.device = torch.device("cuda" if use_cuda else "cpu")
+                self.bert_model = self.bert_model.to(self.device)
+                self.bert_model.eval()
+
+        # exported graphs (onnx / torchscript) run without the eager model
+        with self._timed("backend"):
+            self.backend = create_backend(backend_name, self.bert_model, self.device)
+        print(f"   ⚙️  Inference backend: {self.backend.name}")
+
+        # spacy (for aspect extraction), installed at build time, never
+        # downloaded here
+        spacy_model = getattr(settings, "ABSA_SPACY_MODEL", "en_core_web_sm")
+        with self._timed("spacy"):
+            try:
+                self.nlp = spacy.load(spacy_model)
+            except OSError as e:
+                raise FileNotFoundError(
+                    f"spaCy pipeline '{spacy_model}' is not installed, run "
+                    f"'python -m spacy download {spacy_model}' when building "
+                    "the image."
+                ) from e
+
+        finished = time.monotonic()
+        self.load_seconds["total"] = finished - started
+        self.cold_start_seconds = finished - PROCESS_STARTED
+        print(
+            f"✅ AI Models Loaded Successfully in {finished - started:.2f}s "
+            f"(cold start {self.cold_start_seconds:.2f}s)"
+        )
+
+    @contextmanager
+    def _timed(self, name):
+        started = time.monotonic()
+        yield
+        seconds = time.monotonic() - started
+        self.load_seconds[name] = seconds
+        print(f"   ⏱️  {name} loaded in {seconds:.2f}s")
+
+
+registry = ModelRegistry()
+
+
+def warm_up() -> None:
+    # called by the server entry points (wsgi, asgi, celery worker processes)
+    # as selected by ABSA_MODEL_LOADING; everything else loads on first use
+    if getattr(settings, "ABSA_SHARED_WEIGHTS", {}).get("PRELOAD"):
+        preload()
+        return
+
+    mode = getattr(settings, "ABSA_MODEL_LOADING", "background")
+    if mode == "background":
+        registry.start()
+    elif mode == "eager":
+        try:
+            registry.load()
+        except ModelsUnavailable:
+            pass  # keep serving, /readyz reports the failure
+
+
+def preload() -> None:
+    # Load in the master process (gunicorn --preload, celery prefork) so the
+    # forked workers inherit the weights and share their pages copy-on-write
+    # instead of each loading a copy. No-op unless ABSA_SHARED_WEIGHTS
+    # enables it, or when the models are already there (forked children).
+    config = getattr(settings, "ABSA_SHARED_WEIGHTS", {})
+    if not config.get("PRELOAD") or registry.ready:
+        return
+
+    import torch
+
+    if torch.cuda.is_available():
+        # CUDA does not survive a fork, let every worker load its own model
+        print("   ⚠️  Not preloading models before fork: CUDA is available.")
+        registry.start()
+        return
+
+    try:
+        registry.load()
+    except ModelsUnavailable:
+        return  # workers retry on first use, /readyz reports the failure
+
+    if config.get("GC_FREEZE", True):
+        # move everything loaded so far to the permanent generation: the
+        # workers' collections then never write to (and copy) those pages
+        gc.collect()
+        gc.freeze()
+
+
+def _reset_after_fork() -> None:
+    # a load running in another thread of the parent does not continue in the
+    # child (and may have left the lock held), start over from scratch there
+    if not registry.ready:
+        registry.state = "idle"
+        registry._lock = threading.Lock()
+        registry._start_lock = threading.Lock()
+        registry._thread = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,111 @@
+from django.conf import settings
+
+import os
+import tempfile
+
+
+# role configured for this process by configure_runtime, None until then
+current_role = None
+
+# open lock file of the core slot this process is pinned to (keeps it claimed)
+_slot_lock = None
+# cores the process could use before it was pinned
+_all_cores = None
+
+
+def runtime_config(role) -> dict:
+    config = getattr(settings, "ABSA_RUNTIME", {})
+    return config.get(role) or {}
+
+
+def configure_runtime(role) -> None:
+    # Applies the ABSA_RUNTIME policy of a process role ("web", "celery",
+    # "management"): torch intra/inter-op threads, tokenizer parallelism and
+    # optionally pinning to INTRA_OP cores of its own. Called by the process
+    # entry points before the models are used.
+    global current_role
+
+    import torch
+
+    config = runtime_config(role)
+    current_role = role
+
+    parallelism = config.get("TOKENIZERS_PARALLELISM")
+    if parallelism is not None:
+        os.environ["TOKENIZERS_PARALLELISM"] = "true" if parallelism else "false"
+
+    intra_op = config.get("INTRA_OP")
+    if intra_op:
+        torch.set_num_threads(intra_op)
+
+    inter_op = config.get("INTER_OP")
+    if inter_op and torch.get_num_interop_threads() != inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            # only possible before the first inter-op parallel work
+            print(f"   ⚠️  Could not set torch interop threads: {e}")
+
+    if config.get("PIN_CORES") and intra_op:
+        pin_cores(role, intra_op)
+
+    print(
+        f"   🧵 Runtime ({role}): {torch.get_num_threads()} intra-op, "
+        f"{torch.get_num_interop_threads()} inter-op threads"
+    )
+
+
+def ensure_runtime(default_role="management") -> None:
+    # processes without an entry point of their own (management commands)
+    if current_role is None:
+        configure_runtime(default_role)
+
+
+def pin_cores(role, cores_per_slot) -> list:
+    # Claims the first free slot of cores_per_slot consecutive cores with a
+    # lock file (released when the process exits, so restarted workers reuse
+    # the slot) and pins this process to it. Returns the cores, [] when every
+    # slot is taken or pinning is unsupported.
+    global _slot_lock, _all_cores
+
+    if not hasattr(os, "sched_setaffinity"):
+        return []
+
+    import fcntl
+
+    if _all_cores is None:
+        _all_cores = sorted(os.sched_getaffinity(0))
+    available = _all_cores
+
+    if _slot_lock is not None:
+        # drop the slot held so far (in a forked child this only drops the
+        # inherited reference, the parent keeps its slot)
+        _slot_lock.close()
+        _slot_lock = None
+
+    for slot in range(len(available) // cores_per_slot):
+        path = os.path.join(tempfile.gettempdir(), f"absa-{role}-cores-{slot}.lock")
+        lock = open(path, "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            continue
+
+        cores = available[slot * cores_per_slot : (slot + 1) * cores_per_slot]
+        os.sched_setaffinity(0, cores)
+        _slot_lock = lock
+        return cores
+
+    # no free slot: run unpinned rather than on the cores of another process
+    os.sched_setaffinity(0, available)
+    return []
+
+
+def _repin_after_fork() -> None:
+    # forked workers (gunicorn --preload, spaCy n_process) each claim a slot
+    if _slot_lock is not None and current_role is not None:
+        pin_cores(current_role, runtime_config(current_role).get("INTRA_OP") or 1)
+
+
+os.register_at_fork(after_in_child=_repin_after_fork)
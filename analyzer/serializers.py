@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
@@ -20,12 +21,40 @@ class AnalysisRecordSerializer(serializers.ModelSerializer):
         fields = ["original_text", "results"]
 
 
+def serialize_records(records, aspects) -> list:
+    # Lean equivalent of AnalysisRecordSerializer(many=True) for result
+    # pages: records are {"id", "original_text"} dicts and aspects
+    # (record_id, aspect, sentiment, confidence) tuples, as fetched with
+    # values()/values_list(), so no model instances or fields are involved.
+    results = {record["id"]: [] for record in records}
+    for record_id, aspect, sentiment, confidence in aspects:
+        results[record_id].append(
+            {"aspect": aspect, "sentiment": sentiment, "confidence": confidence}
+        )
+
+    return [
+        {"original_text": record["original_text"], "results": results[record["id"]]}
+        for record in records
+    ]
+
+
 class AnalysisSessionSerializer(serializers.ModelSerializer):
     # Explicitly define inputs so the Form shows them
     csv_file = serializers.FileField(write_only=True, required=False)
     text = serializers.CharField(
         write_only=True, required=False, source="raw_input_text"
     )
+    texts = serializers.ListField(
+        child=serializers.CharField(
+            allow_blank=True,
+            max_length=getattr(settings, "ABSA_TEXT_BATCH", {}).get(
+                "MAX_TEXT_CHARS", 2000
+            ),
+        ),
+        max_length=getattr(settings, "ABSA_TEXT_BATCH", {}).get("MAX_TEXTS", 5000),
+        write_only=True,
+        required=False,
+    )
 
     class Meta:
         model = AnalysisSession
@@ -37,14 +66,44 @@ class AnalysisSessionSerializer(serializers.ModelSerializer):
             "total_items",
             "csv_file",
             "text",
+            "texts",
         ]
         read_only_fields = ["id", "session_type", "created_at", "status", "total_items"]
 
 
-class SessionDetailSerializer(serializers.ModelSerializer):
+class SessionProgressSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+    eta_seconds = serializers.FloatField(read_only=True)
+
     class Meta:
         model = AnalysisSession
-        fields = ["id", "session_type", "status", "created_at", "total_items"]
+        fields = [
+            "id",
+            "status",
+            "total_rows",
+            "processed_rows",
+            "started_at",
+            "finished_at",
+            "rows_per_second",
+            "eta_seconds",
+        ]
+
+
+class SessionDetailSerializer(SessionProgressSerializer):
+    class Meta(SessionProgressSerializer.Meta):
+        fields = [
+            "id",
+            "session_type",
+            "status",
+            "created_at",
+            "total_items",
+            "total_rows",
+            "processed_rows",
+            "started_at",
+            "finished_at",
+            "rows_per_second",
+            "eta_seconds",
+        ]
 
 
 class UserRegistrationSerializer(ModelSerializer):
@@ -1,3 +1,4 @@
+import asyncio
 import torch
 import re
 import html
@@ -5,7 +6,13 @@ import emoji
 import torch.nn.functional as F
 
 
-from django.apps import apps
+from django.conf import settings
+
+from .batching import get_batch_scheduler, get_inference_executor
+from .cache import get_pair_memo, get_result_cache
+from .profiling import in_trace, stage
+from .registry import registry
+from .tokenization import encode_pairs, pad_features
 
 
 class ABSAService:
@@ -23,30 +30,86 @@ class ABSAService:
         # Generic filler nouns
         "thing", "things", "stuff", "bit", "lot", "way", "example"
     }
+
+    # spaCy components used by aspect extraction (everything else is disabled)
+    ASPECT_PIPES = {"tok2vec", "tagger", "attribute_ruler", "parser", "ner"}
+
+    ID2LABEL = {0: "negative", 1: "neutral", 2: "positive"}
+    FALLBACK_ASPECT = "general"
     
+    URL_PATTERN = re.compile(r"http\S+|www\S+|https\S+")
+
     @staticmethod
     def clean_text(text) -> str:
-        text = html.unescape(str(text))
-        text = re.sub(r"http\S+|www\S+|https\S+", "[URL]", text)
-        text = emoji.demojize(text, delimiters=(" ", " "))
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+        return ABSAService.clean_texts([text])[0]
+
+    @staticmethod
+    def clean_texts(texts) -> list:
+        unescape = html.unescape
+        replace_urls = ABSAService.URL_PATTERN.sub
+        demojize = emoji.demojize
+
+        cleaned = []
+        for text in texts:
+            text = replace_urls("[URL]", unescape(str(text)))
+            # emoji are never ASCII, demojize would return the text unchanged
+            if not text.isascii():
+                text = demojize(text, delimiters=(" ", " "))
+            # same as re.sub(r"\s+", " ", text).strip(), both use str.isspace
+            cleaned.append(" ".join(text.split()))
+        return cleaned
 
     @staticmethod
     def get_models():
-        app_config = apps.get_app_config("analyzer")
+        models = registry.get()
         return (
-            app_config.nlp,
-            app_config.tokenizer,
-            app_config.bert_model,
-            app_config.device,
+            models.nlp,
+            models.tokenizer,
+            models.bert_model,
+            models.device,
         )
 
+    @staticmethod
+    def get_backend():
+        return registry.get().backend
+
+    @staticmethod
+    def get_scheduler():
+        return get_batch_scheduler(ABSAService.pair_logits)
+
+    @staticmethod
+    def unused_pipes(nlp) -> list:
+        # only the noun chunk (tagger/parser) and NER components are needed
+        return [
+            name for name in nlp.pipe_names if name not in ABSAService.ASPECT_PIPES
+        ]
+
     @staticmethod
     def extract_aspects(text) -> list:
+        return ABSAService.aspects_from_doc(ABSAService.parse(text))
+
+    @staticmethod
+    def parse(text):
+        nlp, _, _, _ = ABSAService.get_models()
+        return nlp(text, disable=ABSAService.unused_pipes(nlp))
+
+    @staticmethod
+    def pipe_docs(texts, batch_size=None, n_process=None):
         nlp, _, _, _ = ABSAService.get_models()
-        doc = nlp(text)
+        if batch_size is None:
+            batch_size = getattr(settings, "ABSA_SPACY_BATCH_SIZE", 64)
+        if n_process is None:
+            n_process = getattr(settings, "ABSA_SPACY_N_PROCESS", 1)
+
+        return nlp.pipe(
+            texts,
+            batch_size=batch_size,
+            n_process=n_process,
+            disable=ABSAService.unused_pipes(nlp),
+        )
 
+    @staticmethod
+    def aspects_from_doc(doc) -> list:
         candidates_aspects = set()
 
         # Noun Chunks
@@ -75,66 +138,242 @@ class ABSAService:
             if clean_ent and clean_ent not in ABSAService.BLACKLIST_ASPECTS:
                 candidates_aspects.add(clean_ent)
 
-        # Intelligent Filtering (Duplication)
-        ## convert list and sort by length
-        sorted_candidates_aspects = sorted(
-            list(candidates_aspects), key=len, reverse=True
-        )
+        return ABSAService.drop_nested_aspects(candidates_aspects)
 
+    @staticmethod
+    def drop_nested_aspects(candidates) -> list:
+        # Intelligent Filtering (Duplication): longest first, a candidate is
+        # dropped when it occurs inside an aspect already kept. The kept
+        # aspects are joined into one haystack so each check is a single
+        # substring search (a candidate holding the separator itself falls
+        # back to checking the aspects one by one).
         final_aspects = []
-        for candidate in sorted_candidates_aspects:
-            # check if candidate is already inside another longer aspect
-            is_subset = False
-            for aspect in final_aspects:
-                # token-based check
-                if candidate in aspect:
-                    is_subset = True
-                    break
+        haystack = ""
+        for candidate in sorted(candidates, key=len, reverse=True):
+            if "\x00" in candidate:
+                is_subset = any(candidate in aspect for aspect in final_aspects)
+            else:
+                is_subset = candidate in haystack
 
             if not is_subset:
                 final_aspects.append(candidate)
+                haystack += "\x00" + candidate
 
-        return list(final_aspects)
+        return final_aspects
+
+    @staticmethod
+    def plan_batches(lengths, max_batch_size, token_budget=None) -> list:
+        # sort by length so every batch is padded to a similar size, then cut
+        # a new batch when it is full or would exceed the padded token budget
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+
+        batches = []
+        batch = []
+        for idx in order:
+            longest = lengths[idx]
+            is_full = len(batch) >= max_batch_size
+            over_budget = token_budget and (len(batch) + 1) * longest > token_budget
+            if batch and (is_full or over_budget):
+                batches.append(batch)
+                batch = []
+            batch.append(idx)
+
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def pair_logits(pairs, max_batch_size=None, token_budget=None):
+        _, tokenizer, _, _ = ABSAService.get_models()
+        backend = ABSAService.get_backend()
+        if max_batch_size is None:
+            max_batch_size = getattr(settings, "ABSA_MAX_BATCH_SIZE", 32)
+
+        if not pairs:
+            return torch.empty((0, len(ABSAService.ID2LABEL)))
+
+        # Tokenize Pairs (unpadded, padding is applied per batch)
+        with stage("tokenize"):
+            encodings = encode_pairs(tokenizer, pairs)
+
+        # pairs whose token ids were classified before skip the model
+        logits = [None] * len(pairs)
+        pair_memo = get_pair_memo()
+        if pair_memo is not None:
+            keys = [pair_memo.key(ids) for ids in encodings["input_ids"]]
+            memoized = pair_memo.get_many(keys)
+            for idx, key in enumerate(keys):
+                logits[idx] = memoized.get(key)
+
+        pending = [idx for idx, row in enumerate(logits) if row is None]
+        lengths = [len(encodings["input_ids"][idx]) for idx in pending]
+
+        for batch in ABSAService.plan_batches(lengths, max_batch_size, token_budget):
+            batch = [pending[position] for position in batch]
+            with stage("tokenize"):
+                inputs = pad_features(tokenizer, encodings, batch)
+
+            # scatter results back to the original pair order
+            with stage("forward"):
+                batch_logits = backend.logits(inputs).float().cpu().tolist()
+            for idx, row in zip(batch, batch_logits):
+                logits[idx] = row
+
+            if pair_memo is not None:
+                pair_memo.set_many({keys[idx]: logits[idx] for idx in batch})
+
+        return torch.tensor(logits, dtype=torch.float32)
+
+    @staticmethod
+    def plan_pairs(cleaned_text, doc, aspects):
+        # returns (pairs, owners): the (context, aspect) pairs to classify and
+        # the index of the aspect each pair belongs to. Short texts give one
+        # whole-text pair per aspect; long documents pair every aspect with
+        # the sentences of the parsed doc that mention it.
+        long_document_chars = getattr(settings, "ABSA_LONG_DOCUMENT_CHARS", 1000)
+        if not long_document_chars or len(cleaned_text) <= long_document_chars:
+            pairs = [(cleaned_text, aspect) for aspect in aspects]
+            return pairs, list(range(len(aspects)))
+
+        sentences = [sent.text for sent in doc.sents]
+        lowered = [sentence.lower() for sentence in sentences]
+
+        pairs = []
+        owners = []
+        for idx, aspect in enumerate(aspects):
+            contexts = [
+                sentence
+                for sentence, lowered_sentence in zip(sentences, lowered)
+                if aspect in lowered_sentence
+            ]
+            # e.g. the "general" fallback: classify against the whole text
+            for context in contexts or [cleaned_text]:
+                pairs.append((context, aspect))
+                owners.append(idx)
+
+        return pairs, owners
+
+    @staticmethod
+    def aggregate_predictions(aspects, owners, logits) -> list:
+        # average the class probabilities of every pair of an aspect (a
+        # single pair keeps its own probabilities)
+        probs = F.softmax(logits, dim=1)
+        owner_ids = torch.tensor(owners, dtype=torch.long)
+
+        totals = torch.zeros(len(aspects), probs.shape[1])
+        totals.index_add_(0, owner_ids, probs)
+        counts = torch.bincount(owner_ids, minlength=len(aspects)).clamp(min=1)
+        confidences, pred_ids = torch.max(totals / counts.unsqueeze(1), dim=1)
+
+        return [
+            {
+                "aspect": aspect,
+                "sentiment": ABSAService.ID2LABEL[pred_id],
+                "confidence": round(confidence, 4),
+            }
+            for aspect, pred_id, confidence in zip(
+                aspects, pred_ids.tolist(), confidences.tolist()
+            )
+        ]
+
+    @staticmethod
+    def prepare_pairs(text):
+        # returns (cleaned_text, cached analysis or None, plan) where plan is
+        # (aspects, pairs, owners) as produced by plan_pairs
+        with stage("clean"):
+            cleaned_text = ABSAService.clean_text(text)
+
+        # identical texts give identical results, serve them from the cache
+        result_cache = get_result_cache()
+        if result_cache is not None:
+            cached = result_cache.get_many([cleaned_text])
+            if cleaned_text in cached:
+                return cleaned_text, cached[cleaned_text], None
+
+        with stage("parse"):
+            doc = ABSAService.parse(cleaned_text)
+
+        with stage("aspects"):
+            detected_aspects = ABSAService.aspects_from_doc(doc)
+
+            # fallback if not aspects found
+            if not detected_aspects:
+                print("No clear aspects found. Analyze whole sentence as general")
+                detected_aspects = [ABSAService.FALLBACK_ASPECT]
+
+            pairs, owners = ABSAService.plan_pairs(cleaned_text, doc, detected_aspects)
+        return cleaned_text, None, (detected_aspects, pairs, owners)
+
+    @staticmethod
+    def build_analysis(cleaned_text, plan, logits) -> list:
+        aspects, _, owners = plan
+        with stage("aggregate"):
+            results = ABSAService.aggregate_predictions(aspects, owners, logits)
+
+        result_cache = get_result_cache()
+        if result_cache is not None:
+            result_cache.set_many({cleaned_text: results})
+
+        return results
 
     @staticmethod
     def analyze_sentiment(text):
-        nlp, tokenizer, model, device = ABSAService.get_models()
+        cleaned_text, analysis, plan = ABSAService.prepare_pairs(text)
+
+        if analysis is None:
+            # classify all pairs of the text in one batch, shared with other
+            # in-flight requests when the batching scheduler is enabled
+            pairs = plan[1]
+            scheduler = ABSAService.get_scheduler()
+            with stage("inference"):
+                if scheduler is not None:
+                    logits = scheduler.run(pairs)
+                else:
+                    logits = ABSAService.pair_logits(pairs)
 
-        cleaned_text = ABSAService.clean_text(text)
-        detected_aspects = ABSAService.extract_aspects(cleaned_text)
+            analysis = ABSAService.build_analysis(cleaned_text, plan, logits)
 
-        results = []
-        id2label = {0: "negative", 1: "neutral", 2: "positive"}
+        return {
+            "original_text": text,
+            "analysis": analysis,
+        }
+
+    @staticmethod
+    async def analyze_sentiment_async(text):
+        # same steps as analyze_sentiment, but the blocking work runs on the
+        # inference executor (or the batching scheduler) and is awaited
+        loop = asyncio.get_running_loop()
+        executor = get_inference_executor()
+
+        cleaned_text, analysis, plan = await loop.run_in_executor(
+            executor, in_trace(ABSAService.prepare_pairs), text
+        )
 
-        # fallback if not aspects found
-        if not detected_aspects:
-            print("No clear aspects found. Analyze whole sentence as general")
-            detected_aspects = ["general"]
+        if analysis is None:
+            pairs = plan[1]
+            scheduler = ABSAService.get_scheduler()
+            with stage("inference"):
+                if scheduler is not None:
+                    # a timeout cancels the wrapped future, and with it the
+                    # queued request
+                    logits = await asyncio.wait_for(
+                        asyncio.wrap_future(scheduler.submit(pairs)),
+                        scheduler.result_timeout,
+                    )
+                else:
+                    logits = await loop.run_in_executor(
+                        executor, in_trace(ABSAService.pair_logits), pairs
+                    )
 
-        for aspect in detected_aspects:
-            # Tokenize Pair
-            inputs = tokenizer(
+            analysis = await loop.run_in_executor(
+                executor,
+                in_trace(ABSAService.build_analysis),
                 cleaned_text,
-                aspect,
-                return_tensors="pt",
-                truncation=True,
-                max_length=128,
-            ).to(device)
-
-            with torch.no_grad():
-                outputs = model(**inputs)
-                probs = F.softmax(outputs.logits, dim=1)
-                pred_id = torch.argmax(probs, dim=1).item()
-                confidence = probs[0][pred_id].item()
-
-            results.append(
-                {
-                    "aspect": aspect,
-                    "sentiment": id2label[pred_id],
-                    "confidence": round(confidence, 4),
-                }
+                plan,
+                logits,
             )
+
         return {
             "original_text": text,
-            "analysis": results,
+            "analysis": analysis,
         }
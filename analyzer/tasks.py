@@ -1,83 +1,350 @@
-from celery import shared_task
+from celery import chord, shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
 
-import csv
+import os
+import time
 
-from .models import AnalysisRecord, AspectResult, AnalysisSession
-from .services import ABSAService
+from .engine import BulkInferenceEngine
+from .ingest import estimate_rows, iter_row_chunks, plan_shards
+from .models import AnalysisRecord, AnalysisSession, BulkShard
+from .persistence import save_analysis_results
+from .profiling import stage, trace
+from .progress import ProgressTracker, ShardProgressTracker
 
 
-@shared_task
+logger = get_task_logger(__name__)
+
+
+# acks_late + reject_on_worker_lost: a task whose worker dies is delivered
+# again and resumes from its last checkpoint instead of being lost, up to
+# ABSA_BULK_MAX_ATTEMPTS deliveries
+@shared_task(acks_late=True, reject_on_worker_lost=True)
 def process_bulk_file(session_id: int) -> None:
+    # Get Session
     try:
-        # Get Session
         session = AnalysisSession.objects.get(id=session_id)
-        session.status = "Processing"
-        session.save()
-
-        print(f"🚀 Starting bulk processing for session {session_id}")
-
-        # read csv
-        with open(session.csv_file.path, "r", encoding="utf-8", errors="replace") as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-
-        if not rows:
-            raise ValueError("CSV file is empty")
-
-        if rows and "text" in str(rows[0][0]).lower():
-            print("   -> Header detected, skipping first row.")
-            rows = rows[1:]
-
-        # Save total count immediately
-        count = len(rows)
-        session.total_rows = count
-        session.save()
-
-        # process rows
-        all_aspects_results = []
-
-        for i, row in enumerate(rows):
-            if not row:
-                continue
-            text = row[0]
-
-            # run AI logic
-            ai_result = ABSAService.analyze_sentiment(text)
-
-            # create record linked to session
-            record = AnalysisRecord(
-                user=session.user,
-                original_text=text,
-                session=session,
-            )
-            record.save()
-
-            # prepare aspects
-            for item in ai_result["analysis"]:
-                all_aspects_results.append(
-                    AspectResult(
-                        record=record,
-                        aspect=item["aspect"],
-                        sentiment=item["sentiment"],
-                        confidence=item["confidence"],
-                    )
-                )
+    except AnalysisSession.DoesNotExist:
+        logger.error("Session %s not found, nothing to process", session_id)
+        return
+    progress = ProgressTracker(session)
+
+    if session.status == "Completed":
+        return  # delivered again, done already
+
+    if session.shards.exists():
+        # delivered again: the shard tasks own the job, unless the worker was
+        # lost after saving the shards but before sending their tasks
+        if not session.shards_dispatched:
+            logger.warning("Sending the shard tasks of session %s again", session_id)
+            dispatch_shards(session)
+        return
+
+    if not start_attempt(session):
+        # every delivery so far died mid-job (e.g. a row crashing the worker)
+        logger.error(
+            "Session %s failed, its task was delivered %s times",
+            session_id,
+            session.attempts,
+        )
+        progress.finish("Failed")
+        return
+
+    try:
+        resuming = session.checkpoint_offset > 0
+        logger.info(
+            "%s bulk processing for session %s",
+            "Resuming" if resuming else "Starting",
+            session_id,
+        )
+        started = time.perf_counter()
 
-            if i % 10 == 0:
-                session.processed_rows = i
-                session.save()
+        path = session.csv_file.path
 
-        # bulk save results
-        AspectResult.objects.bulk_create(all_aspects_results)
+        # large files are split into shards processed by many workers
+        shards = [] if resuming else plan_bulk_shards(path)
+        if len(shards) > 1:
+            start_sharded_session(session, shards)
+            return
+
+        # Save total count immediately (estimated from a raw line count)
+        progress.start(estimate_rows(path), processed_rows=session.checkpoint_row)
+
+        # stream rows in chunks, batching the BERT calls across rows and
+        # committing each chunk's results with its checkpoint
+        engine = process_rows(session, path, progress, checkpoint=session)
 
         # finish
-        session.status = "Completed"
-        session.processed_rows = len(rows)
-        session.save()
-        print(f"✅ Finished session {session_id}")
+        progress.finish("Completed")
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Finished session %s: %s rows in %.1fs (%.1f rows/sec, inference "
+            "%.1f rows/sec over %s aspects, %s duplicate/cached rows)",
+            session_id,
+            session.processed_rows,
+            elapsed,
+            engine.rows / elapsed,
+            engine.rows_per_second,
+            engine.pairs,
+            engine.reused_rows,
+        )
+
+    except Exception:
+        # the error goes to the log, the status column only holds the state
+        logger.exception("Bulk processing of session %s failed", session_id)
+        progress.finish("Failed")
+
+
+@shared_task(bind=True, max_retries=None, acks_late=True, reject_on_worker_lost=True)
+def process_bulk_shard(self, shard_id: int) -> None:
+    shard = BulkShard.objects.select_related("session").get(id=shard_id)
+    session = shard.session
+    progress = ShardProgressTracker(session)
+    config = getattr(settings, "ABSA_SHARDING", {})
+
+    if shard.status in ("Completed", "Failed"):
+        return  # delivered again after it finished
+
+    if not start_attempt(shard):
+        # out of deliveries: the chord still completes (this task returns)
+        # and finalize_bulk_session fails the session
+        logger.error(
+            "Session %s shard %s failed, its task was delivered %s times",
+            session.id,
+            shard.index,
+            shard.attempts,
+        )
+        shard.status = "Failed"
+        shard.error = f"Gave up after {shard.attempts} attempts"
+        shard.save(update_fields=["status", "error"])
+        return
+
+    try:
+        shard.status = "Processing"
+        shard.save(update_fields=["status"])
+
+        engine = process_rows(
+            session,
+            session.csv_file.path,
+            progress,
+            checkpoint=shard,
+            end=shard.end_offset,
+        )
+        progress.flush()
+
+        shard.status = "Completed"
+        shard.save(update_fields=["status"])
+        logger.info(
+            "Session %s shard %s: %s rows (%.1f rows/sec inference)",
+            session.id,
+            shard.index,
+            shard.processed_rows,
+            engine.rows_per_second,
+        )
 
     except Exception as e:
-        print(f"❌ Error: {e}")
-        # session.status = "Failed"
-        session.status = f"Err: {str(e)[:20]}"
-        session.save()
+        logger.exception("Session %s shard %s failed", session.id, shard.index)
+
+        # chunks before the checkpoint are committed, a retry resumes there
+        progress.flush()
+        shard.error = str(e)
+
+        if self.request.retries < config.get("MAX_RETRIES", 3):
+            shard.status = "Pending"
+            shard.save(update_fields=["status", "error"])
+            raise self.retry(exc=e, countdown=config.get("RETRY_DELAY", 10))
+
+        # out of retries: the shard is failed, the chord still completes and
+        # finalize_bulk_session fails the session
+        shard.status = "Failed"
+        shard.save(update_fields=["status", "error"])
+
+
+@shared_task
+def finalize_bulk_session(session_id: int) -> None:
+    # chord callback, runs once every shard task has finished
+    session = AnalysisSession.objects.get(id=session_id)
+    shards = list(session.shards.all())
+    failed = [shard.index for shard in shards if shard.status != "Completed"]
+
+    session.processed_rows = sum(shard.processed_rows for shard in shards)
+    ShardProgressTracker(session).finish("Failed" if failed else "Completed")
+
+    if failed:
+        logger.error(
+            "Session %s failed, shards %s did not complete", session_id, failed
+        )
+    else:
+        elapsed = (session.finished_at - session.started_at).total_seconds()
+        logger.info(
+            "Finished session %s: %s rows in %.1fs over %s shards",
+            session_id,
+            session.processed_rows,
+            elapsed,
+            len(shards),
+        )
+
+
+def start_attempt(job) -> bool:
+    # counts a delivery of the task of job (a session or a shard), False
+    # once it was delivered ABSA_BULK_MAX_ATTEMPTS times
+    if job.attempts >= getattr(settings, "ABSA_BULK_MAX_ATTEMPTS", 5):
+        return False
+
+    job.attempts += 1
+    job.save(update_fields=["attempts"])
+    return True
+
+
+def plan_bulk_shards(path) -> list:
+    config = getattr(settings, "ABSA_SHARDING", {})
+    shard_bytes = config.get("SHARD_BYTES", 8 * 1024 * 1024)
+    if not config.get("ENABLED") or os.path.getsize(path) < 2 * shard_bytes:
+        return []
+    return plan_shards(path, shard_bytes)
+
+
+def start_sharded_session(session, shards) -> None:
+    with transaction.atomic():
+        shard_rows = BulkShard.objects.bulk_create(
+            [
+                BulkShard(
+                    session=session,
+                    index=index,
+                    start_offset=start,
+                    end_offset=end,
+                    start_row=start_row,
+                    rows=rows,
+                    checkpoint_offset=start,
+                    checkpoint_row=start_row,
+                )
+                for index, (start, end, start_row, rows) in enumerate(shards)
+            ]
+        )
+        ShardProgressTracker(session).start(sum(shard.rows for shard in shard_rows))
+    logger.info("Session %s split into %s shards", session.id, len(shard_rows))
+
+    dispatch_shards(session)
+
+
+def dispatch_shards(session) -> None:
+    # the shard ids come from the DB, the tasks are sent once they are saved.
+    # Losing the worker between the send and the flag below sends them twice
+    # on redelivery; shards finished by then are skipped (process_bulk_shard)
+    shard_ids = list(session.shards.order_by("index").values_list("id", flat=True))
+    chord(process_bulk_shard.si(shard_id) for shard_id in shard_ids)(
+        finalize_bulk_session.si(session.id)
+    )
+
+    session.shards_dispatched = True
+    session.save(update_fields=["shards_dispatched"])
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def process_text_batch(session_id: int, texts: list) -> None:
+    # a JSON batch too large to analyze within the request, see
+    # ABSA_TEXT_BATCH; resumes from its checkpoint when delivered again
+    try:
+        session = AnalysisSession.objects.get(id=session_id)
+    except AnalysisSession.DoesNotExist:
+        logger.error("Session %s not found, nothing to process", session_id)
+        return
+    progress = ProgressTracker(session)
+
+    if session.status == "Completed":
+        return
+
+    if not start_attempt(session):
+        logger.error(
+            "Session %s failed, its task was delivered %s times",
+            session_id,
+            session.attempts,
+        )
+        progress.finish("Failed")
+        return
+
+    try:
+        logger.info(
+            "Processing batch of %s texts for session %s", len(texts), session_id
+        )
+        started = time.perf_counter()
+
+        progress.start(len(texts), processed_rows=session.checkpoint_row)
+        engine = process_texts(session, texts, progress)
+
+        progress.finish("Completed")
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "Finished session %s: %s texts in %.1fs (%.1f rows/sec)",
+            session_id,
+            engine.rows,
+            elapsed,
+            engine.rows / elapsed,
+        )
+
+    except Exception:
+        logger.exception("Batch processing of session %s failed", session_id)
+        progress.finish("Failed")
+
+
+def process_texts(session, texts, progress) -> BulkInferenceEngine:
+    # the text batch counterpart of process_rows: chunks of texts from the
+    # session's checkpoint row on, each committed with the checkpoint after it
+    engine = BulkInferenceEngine()
+    chunk_rows = getattr(settings, "ABSA_BULK_CHUNK_ROWS", 512)
+    start_row = session.checkpoint_row
+
+    AnalysisRecord.objects.filter(session=session, source_row__gte=start_row).delete()
+
+    for start in range(start_row, len(texts), chunk_rows):
+        chunk = texts[start : start + chunk_rows]
+        end = start + len(chunk)
+
+        with trace("bulk"):
+            results = engine.analyze(chunk)
+            with stage("db_write"), transaction.atomic():
+                save_analysis_results(
+                    session, results, source_rows=list(range(start, end))
+                )
+                session.save_checkpoint(0, end)
+
+        progress.advance(len(chunk))
+
+    return engine
+
+
+def process_rows(session, path, progress, checkpoint, end=None) -> BulkInferenceEngine:
+    # Analyze and save the rows of path from the checkpoint (the session, or
+    # a shard ending at `end`) on. Every chunk is committed in one
+    # transaction with the checkpoint after it, so a resumed job never
+    # repeats finished chunks.
+    engine = BulkInferenceEngine()
+    chunk_rows = getattr(settings, "ABSA_BULK_CHUNK_ROWS", 512)
+    next_row = checkpoint.checkpoint_row
+
+    # rows past the checkpoint were never committed with it (e.g. written
+    # by a crashed attempt outside a transaction), start them clean
+    stale = AnalysisRecord.objects.filter(session=session, source_row__gte=next_row)
+    if end is not None:
+        stale = stale.filter(source_row__lt=checkpoint.start_row + checkpoint.rows)
+    stale.delete()
+
+    chunks = iter_row_chunks(path, chunk_rows, checkpoint.checkpoint_offset, end)
+    for rows, offset in chunks:
+        # blank lines are rows of the file but have no text to analyze
+        source_rows = [next_row + idx for idx, row in enumerate(rows) if row]
+        texts = [row[0] for row in rows if row]
+
+        # run AI logic (outside the transaction), then save the chunk and
+        # move the checkpoint past it atomically
+        with trace("bulk"):
+            results = engine.analyze(texts)
+            next_row += len(rows)
+            with stage("db_write"), transaction.atomic():
+                save_analysis_results(session, results, source_rows=source_rows)
+                checkpoint.save_checkpoint(offset, next_row)
+
+        progress.advance(len(rows))
+
+    return engine
@@ -1,3 +1,1277 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import mock, skipUnless
+
+import csv
+import emoji
+import html
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+
+from .backends import (
+    PARITY_BATCHES,
+    TorchBackend,
+    TorchScriptBackend,
+    export_torchscript,
+    load_torch_model,
+    max_logit_diff,
+    quantize_model,
+    sample_inputs,
+)
+from .batching import BatchScheduler, QueueFullError
+from .benchmark_suite import build_tiny_model
+from .export import EXPORT_COLUMNS
+from .ingest import iter_row_chunks, plan_shards
+from .cache import LRUCacheBackend, PairLogitsMemo, ResultCache, model_fingerprint
+from .models import AspectResult, AnalysisRecord, AnalysisSession, BulkShard
+from .serializers import AnalysisRecordSerializer
+from .services import ABSAService
+from .persistence import save_analysis_results
+from .profiling import StageProfiler, render_metrics, stage, trace
+from .registry import ModelRegistry
+from .tasks import process_bulk_file, process_bulk_shard, process_text_batch
+from .tokenization import aspect_window, encode_pairs
+
+
+class SessionRetrieveTests(TestCase):
+    RECORDS = 120
+    ASPECTS = 3
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username="reader", password="secret")
+        cls.session = AnalysisSession.objects.create(
+            user=cls.user,
+            session_type="FILE",
+            status="Completed",
+            total_items=cls.RECORDS,
+        )
+        records = AnalysisRecord.objects.bulk_create(
+            AnalysisRecord(
+                session=cls.session, user=cls.user, original_text=f"review {i}"
+            )
+            for i in range(cls.RECORDS)
+        )
+        AspectResult.objects.bulk_create(
+            AspectResult(
+                record=record,
+                aspect=f"aspect {j}",
+                sentiment=["Positive", "Negative", "Neutral"][j],
+                confidence=0.5 + j / 10,
+            )
+            for record in records
+            for j in range(cls.ASPECTS)
+        )
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("session-detail", args=[self.session.id])
+
+    def test_page_query_count_is_constant(self) -> None:
+        # session, records of the page, aspects of the page; independent of
+        # the page size and the number of aspects per record
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {"page_size": 100})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]["records"]), 100)
+
+    def test_records_match_model_serializer(self) -> None:
+        response = self.client.get(self.url, {"page_size": 100})
+
+        records = self.session.records.order_by("id")[:100]
+        expected = AnalysisRecordSerializer(records, many=True).data
+        self.assertEqual(response.data["results"]["records"], expected)
+
+    def test_cursor_walks_every_record(self) -> None:
+        seen = []
+        url, params = self.url, {"page_size": 50}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [r["original_text"] for r in response.data["results"]["records"]]
+            url, params = response.data["next"], None
+
+        self.assertEqual(seen, [f"review {i}" for i in range(self.RECORDS)])
+
+
+class ShardedSessionOrderTests(TestCase):
+    # three shards writing concurrently: their records' ids interleave
+    ROWS = [row for i in range(10) for row in (i, 10 + i, 20 + i)]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username="sharder")
+        cls.session = AnalysisSession.objects.create(
+            user=cls.user,
+            session_type="FILE",
+            status="Completed",
+            shards_dispatched=True,
+        )
+        AnalysisRecord.objects.bulk_create(
+            AnalysisRecord(
+                session=cls.session,
+                user=cls.user,
+                original_text=f"review {row}",
+                source_row=row,
+            )
+            for row in cls.ROWS
+        )
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_follow_the_csv(self) -> None:
+        seen = []
+        url = reverse("session-detail", args=[self.session.id])
+        params = {"page_size": 4}
+        while url:
+            response = self.client.get(url, params)
+            seen += [r["original_text"] for r in response.data["results"]["records"]]
+            url, params = response.data["next"], None
+
+        self.assertEqual(seen, [f"review {row}" for row in range(30)])
+
+    def test_export_follows_the_csv(self) -> None:
+        url = reverse("session-export", args=[self.session.id, "csv"])
+        content = b"".join(self.client.get(url).streaming_content)
+
+        rows = list(csv.reader(io.StringIO(content.decode())))[1:]
+        self.assertEqual([int(row[1]) for row in rows], list(range(30)))
+
+
+class LRUCacheBackendTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self) -> None:
+        backend = LRUCacheBackend(max_entries=2)
+        backend.set_many({"a": 1, "b": 2})
+        backend.get_many(["a"])  # "b" is now the least recently used
+        backend.set_many({"c": 3})
+
+        self.assertEqual(backend.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+        self.assertEqual(len(backend), 2)
+
+    def test_expired_entries_are_misses(self) -> None:
+        backend = LRUCacheBackend(timeout=0)
+        backend.set_many({"a": 1})
+
+        self.assertEqual(backend.get_many(["a"]), {})
+        self.assertEqual(len(backend), 0)
+
+    def test_values_are_copies(self) -> None:
+        backend = LRUCacheBackend()
+        analysis = [{"aspect": "food", "sentiment": "positive", "confidence": 0.9}]
+        backend.set_many({"a": analysis})
+        analysis[0]["sentiment"] = "changed by the caller"
+        backend.get_many(["a"])["a"].append({"aspect": "added by a hit"})
+
+        self.assertEqual(
+            backend.get_many(["a"])["a"],
+            [{"aspect": "food", "sentiment": "positive", "confidence": 0.9}],
+        )
+
+
+class ResultCacheTests(SimpleTestCase):
+    ANALYSIS = [{"aspect": "food", "sentiment": "positive", "confidence": 0.9}]
+
+    def test_hits_and_misses(self) -> None:
+        cache = ResultCache(LRUCacheBackend(), "model-a")
+        cache.set_many({"the food was great": self.ANALYSIS})
+
+        found = cache.get_many(["the food was great", "the service was slow"])
+
+        self.assertEqual(found, {"the food was great": self.ANALYSIS})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_entries_are_keyed_on_the_fingerprint(self) -> None:
+        backend = LRUCacheBackend()
+        ResultCache(backend, "model-a").set_many({"text": self.ANALYSIS})
+
+        self.assertEqual(ResultCache(backend, "model-b").get_many(["text"]), {})
+        self.assertEqual(
+            ResultCache(backend, "model-a").get_many(["text"]),
+            {"text": self.ANALYSIS},
+        )
+
+    def test_fingerprint_follows_model_files_and_settings(self) -> None:
+        with tempfile.TemporaryDirectory() as model_path:
+            weights = os.path.join(model_path, "model.safetensors")
+            with open(weights, "wb") as f:
+                f.write(b"weights")
+            fingerprint = model_fingerprint(model_path)
+
+            self.assertEqual(model_fingerprint(model_path), fingerprint)
+            with override_settings(ABSA_MAX_SEQ_LENGTH=64):
+                self.assertNotEqual(model_fingerprint(model_path), fingerprint)
+            with override_settings(ABSA_INFERENCE_BACKEND="onnx"):
+                self.assertNotEqual(model_fingerprint(model_path), fingerprint)
+
+            with open(weights, "wb") as f:
+                f.write(b"retrained weights")
+            self.assertNotEqual(model_fingerprint(model_path), fingerprint)
+
+
+class PairLogitsMemoTests(SimpleTestCase):
+    def test_keys_follow_token_ids_and_fingerprint(self) -> None:
+        memo = PairLogitsMemo(max_bytes=1 << 20, fingerprint="model-a")
+        memo.set_many({memo.key([101, 7, 102]): [0.1, 0.2, 0.7]})
+
+        self.assertEqual(
+            memo.get_many([memo.key([101, 7, 102]), memo.key([101, 8, 102])]),
+            {memo.key([101, 7, 102]): (0.1, 0.2, 0.7)},
+        )
+        other_model = PairLogitsMemo(max_bytes=1 << 20, fingerprint="model-b")
+        self.assertNotEqual(other_model.key([101, 7, 102]), memo.key([101, 7, 102]))
+
+    def test_evicts_oldest_past_max_bytes(self) -> None:
+        key_bytes = len(PairLogitsMemo(0, "m").key([1]))
+        entry_bytes = key_bytes + PairLogitsMemo.ENTRY_OVERHEAD
+        memo = PairLogitsMemo(max_bytes=2 * entry_bytes, fingerprint="m")
+        memo.set_many({memo.key([1]): [1.0], memo.key([2]): [2.0]})
+        memo.get_many([memo.key([1])])  # [2] is now the oldest
+        memo.set_many({memo.key([3]): [3.0]})
+
+        self.assertEqual(
+            set(memo.get_many([memo.key([i]) for i in (1, 2, 3)])),
+            {memo.key([1]), memo.key([3])},
+        )
+        self.assertEqual(memo.evictions, 1)
+        self.assertEqual(memo.size, 2 * entry_bytes)
+
+
+class PlanBatchesTests(SimpleTestCase):
+    LENGTHS = [30, 5, 12, 8, 30, 7, 50, 6]
+
+    def test_batches_are_sorted_by_length(self) -> None:
+        batches = ABSAService.plan_batches(self.LENGTHS, max_batch_size=3)
+
+        self.assertEqual(batches, [[1, 7, 5], [3, 2, 0], [4, 6]])
+
+    def test_every_pair_is_planned_once(self) -> None:
+        batches = ABSAService.plan_batches(self.LENGTHS, 3, token_budget=64)
+
+        self.assertEqual(
+            sorted(idx for batch in batches for idx in batch),
+            list(range(len(self.LENGTHS))),
+        )
+
+    def test_token_budget_limits_padded_batch_size(self) -> None:
+        batches = ABSAService.plan_batches(self.LENGTHS, 8, token_budget=60)
+
+        for batch in batches:
+            longest = max(self.LENGTHS[idx] for idx in batch)
+            if len(batch) > 1:
+                self.assertLessEqual(len(batch) * longest, 60)
+        self.assertEqual(batches, [[1, 7, 5, 3, 2], [0, 4], [6]])
+
+    def test_pair_over_the_budget_gets_its_own_batch(self) -> None:
+        batches = ABSAService.plan_batches([100, 4, 4], 8, token_budget=50)
+
+        self.assertEqual(batches, [[1, 2], [0]])
+
+    def test_no_pairs(self) -> None:
+        self.assertEqual(ABSAService.plan_batches([], 8, token_budget=50), [])
+
+
+class WorkerKilled(BaseException):
+    pass
+
+
+class BatchSchedulerTests(SimpleTestCase):
+    def test_callers_get_their_slice_of_the_batch(self) -> None:
+        scheduler = BatchScheduler(
+            lambda pairs, max_batch_size: [[len(text)] for text, _ in pairs],
+            max_wait_ms=50,
+        )
+        first = scheduler.submit([("a", "x"), ("bb", "x")])
+        second = scheduler.submit([("ccc", "x")])
+
+        self.assertEqual(first.result(timeout=5), [[1], [2]])
+        self.assertEqual(second.result(timeout=5), [[3]])
+        self.assertEqual(scheduler.stats()["pairs"], 3)
+
+    def test_dead_worker_fails_its_callers_and_is_replaced(self) -> None:
+        started, release = threading.Event(), threading.Event()
+
+        def handler(pairs, max_batch_size):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+                raise WorkerKilled()
+            return [[0.0] for _ in pairs]
+
+        scheduler = BatchScheduler(handler, max_batch_size=1, max_wait_ms=0)
+        with mock.patch("threading.excepthook"):
+            in_flight = scheduler.submit([("a", "x")])
+            started.wait(5)
+            queued = scheduler.submit([("b", "x")])
+            release.set()
+
+            with self.assertRaises(RuntimeError):
+                in_flight.result(timeout=5)
+            with self.assertRaises(RuntimeError):
+                queued.result(timeout=5)
+            scheduler._worker.join(5)
+
+        self.assertEqual(scheduler.submit([("c", "x")]).result(timeout=5), [[0.0]])
+
+    def test_timed_out_request_is_cancelled_and_skipped(self) -> None:
+        started, release = threading.Event(), threading.Event()
+        seen = []
+
+        def handler(pairs, max_batch_size):
+            seen.extend(pairs)
+            started.set()
+            release.wait(5)
+            return [[0.0] for _ in pairs]
+
+        scheduler = BatchScheduler(
+            handler, max_batch_size=1, max_wait_ms=0, result_timeout=0.05
+        )
+        in_flight = scheduler.submit([("a", "x")])
+        started.wait(5)
+        with self.assertRaises(TimeoutError):
+            scheduler.run([("b", "x")])
+        release.set()
+
+        self.assertEqual(in_flight.result(timeout=5), [[0.0]])
+        self.assertEqual(scheduler.submit([("c", "x")]).result(timeout=5), [[0.0]])
+        self.assertEqual(seen, [("a", "x"), ("c", "x")])
+
+
+class TinyModelTestCase(SimpleTestCase):
+    # randomly initialized tiny BERT and tokenizer built offline, see
+    # benchmark_suite.build_tiny_model
+    @classmethod
+    def setUpClass(cls) -> None:
+        from transformers import AutoModelForSequenceClassification
+        from transformers import AutoTokenizer
+
+        super().setUpClass()
+        cls.workdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.workdir.cleanup)
+        cls.model_path = os.path.join(cls.workdir.name, "model")
+        build_tiny_model(cls.model_path)
+        cls.tokenizer = AutoTokenizer.from_pretrained(cls.model_path)
+        cls.model = AutoModelForSequenceClassification.from_pretrained(
+            cls.model_path
+        ).eval()
+
+
+class TorchScriptExportTests(TinyModelTestCase):
+    def test_traced_graph_matches_eager_on_other_shapes(self) -> None:
+        import torch
+
+        path = os.path.join(self.workdir.name, "model.pt")
+        export_torchscript(self.model, self.tokenizer, path)
+        reference = TorchBackend(self.model, torch.device("cpu"))
+        traced = TorchScriptBackend(path)
+
+        for pairs in PARITY_BATCHES:
+            self.assertLess(
+                max_logit_diff(reference, traced, self.tokenizer, pairs), 1e-4
+            )
+
+
+class QuantizedArtifactTests(TinyModelTestCase):
+    def test_artifact_round_trip(self) -> None:
+        artifact = os.path.join(self.workdir.name, "model.int8.pt")
+        with override_settings(
+            ABSA_MODEL_PATH=self.model_path, ABSA_QUANTIZED_MODEL_PATH=artifact
+        ):
+            call_command("quantize_model", output=artifact, stdout=StringIO())
+            loaded = load_torch_model(quantization="artifact", mmap_weights=False)
+
+        inputs = sample_inputs(self.tokenizer)
+        expected = quantize_model(self.model)(**inputs).logits
+        self.assertTrue(loaded(**inputs).logits.equal(expected))
+
+    def test_fingerprint_follows_quantization(self) -> None:
+        with override_settings(ABSA_QUANTIZATION=None):
+            fp32 = model_fingerprint(self.model_path)
+        with override_settings(ABSA_QUANTIZATION="artifact"):
+            self.assertNotEqual(model_fingerprint(self.model_path), fp32)
+
+
+class EncodePairsTests(TinyModelTestCase):
+    FILLER = " ".join(f"The table was fine on day {i}." for i in range(40))
+    LONG_TEXT = f"{FILLER} The pasta was cold. {FILLER}"
+
+    def test_short_pairs_are_encoded_whole(self) -> None:
+        pairs = [("The pasta was cold.", "pasta"), ("Great coffee.", "coffee")]
+
+        encodings = encode_pairs(self.tokenizer, pairs, max_length=32, mode="window")
+
+        expected = self.tokenizer(
+            [text for text, _ in pairs], [aspect for _, aspect in pairs]
+        )
+        self.assertEqual(encodings["input_ids"], expected["input_ids"])
+
+    def test_window_keeps_the_aspect_mention(self) -> None:
+        pairs = [(self.LONG_TEXT, "pasta")]
+
+        windowed = encode_pairs(self.tokenizer, pairs, max_length=64, mode="window")
+        truncated = encode_pairs(
+            self.tokenizer, pairs, max_length=64, mode="truncate"
+        )
+
+        self.assertLessEqual(len(windowed["input_ids"][0]), 64)
+        context = self.tokenizer.decode(
+            windowed["input_ids"][0], skip_special_tokens=True
+        )
+        self.assertIn("pasta was cold", context)
+        self.assertNotIn(
+            "pasta was cold",
+            self.tokenizer.decode(truncated["input_ids"][0], skip_special_tokens=True),
+        )
+
+    def test_aspect_window(self) -> None:
+        text = "One. Two has pasta! Three? Four. Five pasta. Six."
+
+        self.assertEqual(
+            aspect_window(text, "PASTA", window=1),
+            "One. Two has pasta! Three? Four. Five pasta. Six.",
+        )
+        self.assertEqual(
+            aspect_window(text, "pasta", window=0), "Two has pasta! Five pasta."
+        )
+        self.assertEqual(aspect_window(text, "steak"), text)
+
+
+class AggregatePredictionsTests(SimpleTestCase):
+    def test_probabilities_are_averaged_per_aspect(self) -> None:
+        import torch
+
+        # softmax of these rows: [0.1, 0.2, 0.7], [0.5, 0.3, 0.2], [0.6, 0.3, 0.1]
+        logits = torch.tensor(
+            [[0.1, 0.2, 0.7], [0.5, 0.3, 0.2], [0.6, 0.3, 0.1]]
+        ).log()
+
+        results = ABSAService.aggregate_predictions(
+            ["food", "service"], [0, 1, 1], logits
+        )
+
+        self.assertEqual(
+            results,
+            [
+                {"aspect": "food", "sentiment": "positive", "confidence": 0.7},
+                # mean of [0.5, 0.3, 0.2] and [0.6, 0.3, 0.1]
+                {"aspect": "service", "sentiment": "negative", "confidence": 0.55},
+            ],
+        )
+
+    def test_pair_order_does_not_matter(self) -> None:
+        import torch
+
+        logits = torch.randn(5, 3, generator=torch.Generator().manual_seed(0))
+        owners = [0, 1, 0, 2, 1]
+        order = [3, 1, 4, 0, 2]
+
+        self.assertEqual(
+            ABSAService.aggregate_predictions(["a", "b", "c"], owners, logits),
+            ABSAService.aggregate_predictions(
+                ["a", "b", "c"], [owners[idx] for idx in order], logits[order]
+            ),
+        )
+
+
+class ProbeTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.registry = ModelRegistry()
+        patcher = mock.patch("analyzer.views.registry", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def load_with(self, load):
+        return mock.patch.object(self.registry, "_load", load)
+
+    def wait_for_loader(self) -> None:
+        self.registry._thread.join(5)
+        self.assertFalse(self.registry._thread.is_alive())
+
+    def test_readyz_answers_while_loading(self) -> None:
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_load():
+            loading.set()
+            release.wait(5)
+
+        with self.load_with(slow_load):
+            self.assertEqual(self.client.get("/readyz").status_code, 503)
+            loading.wait(5)
+
+            # the loader holds the load lock, the probe must not wait for it
+            response = self.client.get("/readyz")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["state"], "loading")
+            self.assertEqual(self.client.get("/healthz").status_code, 200)
+
+            release.set()
+            self.wait_for_loader()
+
+        self.assertEqual(self.client.get("/readyz").status_code, 200)
+
+    def test_readyz_reports_a_failed_load(self) -> None:
+        load = mock.Mock(side_effect=FileNotFoundError("no model here"))
+
+        with self.load_with(load), redirect_stdout(StringIO()):
+            self.assertEqual(self.client.get("/readyz").status_code, 503)
+            self.wait_for_loader()
+            self.assertEqual(self.registry.state, "failed")
+
+            # reported, and retried in the background
+            response = self.client.get("/readyz")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["error"], "no model here")
+            self.assertEqual(self.client.get("/healthz").status_code, 200)
+            self.wait_for_loader()
+
+        self.assertEqual(load.call_count, 2)
+
+
+class ProcessBulkFileTests(TestCase):
+    def test_failure_is_recorded_as_failed(self) -> None:
+        user = User.objects.create_user(username="uploader")
+        session = AnalysisSession.objects.create(user=user, session_type="FILE")
+
+        with self.assertLogs("analyzer.tasks", "ERROR"):
+            process_bulk_file(session.id)  # no csv file attached
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, "Failed")
+        self.assertIsNotNone(session.finished_at)
+
+    def test_missing_session_is_logged(self) -> None:
+        with self.assertLogs("analyzer.tasks", "ERROR"):
+            process_bulk_file(0)
+
+    @override_settings(ABSA_BULK_MAX_ATTEMPTS=3)
+    def test_redeliveries_are_capped(self) -> None:
+        user = User.objects.create_user(username="uploader")
+        session = AnalysisSession.objects.create(
+            user=user, session_type="FILE", status="Processing", attempts=3
+        )
+
+        with self.assertLogs("analyzer.tasks", "ERROR") as logs:
+            process_bulk_file(session.id)
+
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.attempts), ("Failed", 3))
+        self.assertIn("delivered 3 times", logs.output[0])
+
+    @override_settings(ABSA_BULK_MAX_ATTEMPTS=3)
+    def test_shard_redeliveries_are_capped(self) -> None:
+        user = User.objects.create_user(username="uploader")
+        session = AnalysisSession.objects.create(user=user, session_type="FILE")
+        shard = BulkShard.objects.create(
+            session=session,
+            index=0,
+            start_offset=0,
+            end_offset=100,
+            start_row=0,
+            rows=10,
+            status="Processing",
+            attempts=3,
+        )
+
+        with self.assertLogs("analyzer.tasks", "ERROR"):
+            process_bulk_shard(shard.id)
+
+        shard.refresh_from_db()
+        self.assertEqual((shard.status, shard.attempts), ("Failed", 3))
+
+    def sharded_session(self, dispatched):
+        user = User.objects.create_user(username="uploader")
+        session = AnalysisSession.objects.create(
+            user=user,
+            session_type="FILE",
+            status="Processing",
+            shards_dispatched=dispatched,
+        )
+        shards = BulkShard.objects.bulk_create(
+            BulkShard(
+                session=session,
+                index=index,
+                start_offset=index * 100,
+                end_offset=(index + 1) * 100,
+                start_row=index * 10,
+                rows=10,
+            )
+            for index in range(3)
+        )
+        return session, [shard.id for shard in shards]
+
+    def test_shards_saved_but_not_sent_are_sent_on_redelivery(self) -> None:
+        session, shard_ids = self.sharded_session(dispatched=False)
+
+        with (
+            mock.patch("analyzer.tasks.chord") as chord,
+            self.assertLogs("analyzer.tasks", "WARNING"),
+        ):
+            process_bulk_file(session.id)
+
+        (header,) = chord.call_args.args
+        self.assertEqual([task.args[0] for task in header], shard_ids)
+        chord.return_value.assert_called_once()
+        session.refresh_from_db()
+        self.assertTrue(session.shards_dispatched)
+
+    def test_sent_shards_are_not_sent_again(self) -> None:
+        session, _ = self.sharded_session(dispatched=True)
+
+        with mock.patch("analyzer.tasks.chord") as chord:
+            process_bulk_file(session.id)
+
+        chord.assert_not_called()
+
+
+class CsvFileTestCase(SimpleTestCase):
+    # a csv with a header, quoted fields holding line breaks and quotes, a
+    # blank line and no trailing line break
+    ROWS = [
+        [f"review {i}\nsecond line, with \"quotes\"" if i % 7 == 0 else f"review {i}"]
+        for i in range(60)
+    ]
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(handle, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["text"])
+            writer.writerows(self.ROWS[:30])
+            f.write("\n")
+            writer.writerows(self.ROWS[30:])
+        with open(self.path, "rb+") as f:
+            f.truncate(os.path.getsize(self.path) - 2)  # drop the last \r\n
+
+        self.expected = self.ROWS[:30] + [[]] + self.ROWS[30:]
+        with open(self.path, "rb") as f:
+            self.data = f.read()
+
+    def rows_of(self, start=0, end=None, chunk_rows=8) -> list:
+        return [
+            row
+            for rows, _ in iter_row_chunks(self.path, chunk_rows, start, end)
+            for row in rows
+        ]
+
+
+class PlanShardsTests(CsvFileTestCase):
+    def test_shards_join_back_to_the_file(self) -> None:
+        shards = plan_shards(self.path, shard_bytes=100, block_size=64)
+
+        self.assertGreater(len(shards), 3)
+        self.assertEqual(shards[0][0], 0)
+        self.assertEqual(shards[-1][1], len(self.data))
+        for (_, end, _, _), (start, _, _, _) in zip(shards, shards[1:]):
+            self.assertEqual(end, start)
+
+    def test_cuts_are_record_boundaries(self) -> None:
+        shards = plan_shards(self.path, shard_bytes=100, block_size=64)
+
+        rows = []
+        for start, end, start_row, count in shards:
+            self.assertEqual(start_row, len(rows))
+            shard_rows = self.rows_of(start, end)
+            self.assertEqual(len(shard_rows), count)
+            rows += shard_rows
+        self.assertEqual(rows, self.expected)
+
+    def test_no_cut_inside_a_quoted_line_break(self) -> None:
+        quoted = self.data.index(b"review 7\n") + len(b"review 7")
+
+        for start, end, _, _ in plan_shards(self.path, 1, block_size=16):
+            self.assertNotEqual(end, quoted + 1)
+            self.assertTrue(end == len(self.data) or self.data[end - 1 : end] == b"\n")
+
+
+class IterRowChunksTests(CsvFileTestCase):
+    def test_chunks_skip_the_header(self) -> None:
+        chunks = list(iter_row_chunks(self.path, 8))
+
+        self.assertEqual([len(rows) for rows, _ in chunks], [8] * 7 + [5])
+        self.assertEqual([row for rows, _ in chunks for row in rows], self.expected)
+        self.assertEqual(chunks[-1][1], len(self.data))
+
+    def test_offsets_resume_after_the_chunk(self) -> None:
+        # a checkpoint is (offset after a chunk, rows read so far)
+        checkpoint_row = 0
+        for rows, offset in iter_row_chunks(self.path, 8):
+            checkpoint_row += len(rows)
+            self.assertEqual(
+                self.rows_of(start=offset), self.expected[checkpoint_row:]
+            )
+
+    def test_resume_within_a_byte_range(self) -> None:
+        start, end, start_row, count = plan_shards(self.path, 200)[1]
+        (first, offset), *_ = iter_row_chunks(self.path, 3, start, end)
+
+        self.assertEqual(
+            self.rows_of(offset, end),
+            self.expected[start_row + len(first) : start_row + count],
+        )
+
+
+class StrayQuoteTestCase(SimpleTestCase):
+    # unquoted fields with a quote inside (an inch mark) are data to csv, they
+    # must not open a quoted field that swallows the rest of the file
+    def setUp(self) -> None:
+        lines = [f"review {i}" for i in range(2006)]
+        lines[5] = 'The 5" screen is great'
+        lines[900] = 'a 7" tablet, "quoted ""and"" escaped"'
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(handle, "w") as f:
+            f.write("text\n" + "\n".join(lines) + "\n")
+
+        with open(self.path, newline="") as f:
+            self.expected = list(csv.reader(f))[1:]
+
+    def test_row_chunks(self) -> None:
+        chunks = list(iter_row_chunks(self.path, 100))
+
+        self.assertEqual([len(rows) for rows, _ in chunks], [100] * 20 + [6])
+        self.assertEqual([row for rows, _ in chunks for row in rows], self.expected)
+        self.assertEqual(self.expected[5], ['The 5" screen is great'])
+
+    def test_shards(self) -> None:
+        # the first cut lands right before the stray quote, the next one just
+        # after it; none may run on to the end of the file
+        head = len(b"text\n") + sum(len(f"review {i}\n") for i in range(5))
+        shards = plan_shards(self.path, head, block_size=16)
+
+        self.assertEqual(shards[0], (0, head, 0, 5))
+        self.assertEqual(shards[1][2:], (5, 4))
+        self.assertTrue(all(end - start < 2 * head for start, end, _, _ in shards))
+
+        rows = []
+        for start, end, start_row, count in shards:
+            self.assertEqual(start_row, len(rows))
+            shard_rows = [
+                row
+                for chunk, _ in iter_row_chunks(self.path, 50, start, end)
+                for row in chunk
+            ]
+            self.assertEqual(len(shard_rows), count)
+            rows += shard_rows
+        self.assertEqual(rows, self.expected)
+
+
+class TextStageTests(SimpleTestCase):
+    # the batch implementations against the per-item code they replaced
+    @staticmethod
+    def reference_clean_text(text) -> str:
+        text = html.unescape(str(text))
+        text = re.sub(r"http\S+|www\S+|https\S+", "[URL]", text)
+        text = emoji.demojize(text, delimiters=(" ", " "))
+        return re.sub(r"\s+", " ", text).strip()
+
+    @staticmethod
+    def reference_drop_nested_aspects(candidates) -> list:
+        final_aspects = []
+        for candidate in sorted(candidates, key=len, reverse=True):
+            if not any(candidate in aspect for aspect in final_aspects):
+                final_aspects.append(candidate)
+        return final_aspects
+
+    def test_clean_texts_matches_per_item_cleaning(self) -> None:
+        texts = [
+            "The food was great &amp; cheap!",
+            "  Visit   www.example.com/menu\tor https://x.io/a?b=1 \n now ",
+            "Great burger 🍔🔥 but fries were soggy",
+            "Café très sympa\u00a0and\u2003spaced\u3000out 👍🏽",
+            "&lt;b&gt;bold&lt;/b&gt; &#128512; entity emoji",
+            "",
+            " \n\t ",
+            12345,
+        ]
+        rng = random.Random(0)
+        alphabet = "ab é😀 \t\n&amp;;http:/www.x\u00a0"
+        texts += [
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            for _ in range(500)
+        ]
+
+        self.assertEqual(
+            ABSAService.clean_texts(texts),
+            [self.reference_clean_text(text) for text in texts],
+        )
+        self.assertEqual(
+            ABSAService.clean_text(texts[1]), self.reference_clean_text(texts[1])
+        )
+
+    def test_drop_nested_aspects_matches_pairwise_check(self) -> None:
+        rng = random.Random(0)
+        words = ["food", "service", "ice", "pizza hut", "hut", "a", "wine list"]
+        cases = [
+            [],
+            ["service", "ice", "food"],
+            ["pizza hut", "hut", "pizza", "piz"],
+            ["a\x00b", "a", "b", "\x00"],
+        ]
+        for _ in range(300):
+            cases.append(
+                list(
+                    {
+                        " ".join(rng.sample(words, rng.randint(1, 3)))[
+                            : rng.randint(1, 20)
+                        ]
+                        for _ in range(rng.randint(1, 8))
+                    }
+                )
+            )
+
+        for candidates in cases:
+            self.assertEqual(
+                ABSAService.drop_nested_aspects(candidates),
+                self.reference_drop_nested_aspects(candidates),
+            )
+
+
+class SaveAnalysisResultsTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="writer")
+        self.session = AnalysisSession.objects.create(
+            user=self.user, session_type="FILE"
+        )
+        self.results = [
+            {
+                "original_text": f"review {i}",
+                "analysis": [
+                    {"aspect": f"aspect {j}", "sentiment": "Positive", "confidence": 0.5}
+                    for j in range(i % 3)
+                ],
+            }
+            for i in range(5)
+        ]
+
+    def assert_saved(self, records) -> None:
+        self.assertTrue(all(record.pk for record in records))
+        self.assertEqual(
+            list(self.session.records.order_by("id").values_list("source_row", flat=True)),
+            [10, 11, 12, 13, 14],
+        )
+        for record, result in zip(records, self.results):
+            self.assertEqual(record.results.count(), len(result["analysis"]))
+
+    def test_bulk_insert_returns_primary_keys(self) -> None:
+        records = save_analysis_results(
+            self.session, self.results, batch_size=2, source_rows=range(10, 15)
+        )
+        self.assert_saved(records)
+
+    def test_fallback_without_returning_rows(self) -> None:
+        # e.g. MySQL: one INSERT per record, aspects still attached to them
+        with mock.patch.object(
+            type(connection.features), "can_return_rows_from_bulk_insert", False
+        ):
+            records = save_analysis_results(
+                self.session, self.results, batch_size=2, source_rows=range(10, 15)
+            )
+        self.assert_saved(records)
+
+
+def fake_analyze(self, texts) -> list:
+    # BulkInferenceEngine.analyze without the models
+    return [
+        {
+            "original_text": text,
+            "analysis": [
+                {"aspect": "general", "sentiment": "neutral", "confidence": 0.5}
+            ],
+        }
+        for text in texts
+    ]
+
+
+@mock.patch("analyzer.engine.BulkInferenceEngine.analyze", fake_analyze)
+class TextBatchTests(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="batcher")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("session-list")
+
+    def post(self, texts):
+        return self.client.post(self.url, {"texts": texts}, format="json")
+
+    def test_small_batch_is_answered_with_results(self) -> None:
+        response = self.post(["good food", "slow service"])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["status"], "Completed")
+        self.assertEqual(
+            [result["original_text"] for result in response.data["results"]],
+            ["good food", "slow service"],
+        )
+
+    def test_failed_save_is_rolled_back_and_reported(self) -> None:
+        def save_then_fail(session, results, **kwargs):
+            save_analysis_results(session, results[:1], **kwargs)
+            raise RuntimeError("database went away halfway through the batch")
+
+        with (
+            mock.patch("analyzer.views.save_analysis_results", save_then_fail),
+            self.assertLogs("analyzer.views", "ERROR"),
+        ):
+            response = self.post(["good food", "slow service"])
+
+        self.assertEqual(response.status_code, 500)
+        session = AnalysisSession.objects.get(user=self.user)
+        self.assertEqual(session.status, "Failed")
+        self.assertFalse(session.records.exists())
+
+    @override_settings(ABSA_TEXT_BATCH={"MAX_TEXTS": 10, "MAX_TEXT_CHARS": 5})
+    def test_batch_limits(self) -> None:
+        self.assertEqual(self.post(["x"] * 11).status_code, 400)
+        self.assertEqual(self.post(["123456"]).status_code, 400)
+        self.assertFalse(AnalysisSession.objects.exists())
+
+    def test_task_failure_is_recorded_as_failed(self) -> None:
+        session = AnalysisSession.objects.create(
+            user=self.user, session_type="BATCH", total_rows=2
+        )
+
+        with (
+            mock.patch("analyzer.tasks.process_texts", side_effect=RuntimeError),
+            self.assertLogs("analyzer.tasks", "ERROR"),
+        ):
+            process_text_batch(session.id, ["good food", "slow service"])
+
+        session.refresh_from_db()
+        self.assertEqual((session.status, session.attempts), ("Failed", 1))
+
+
+class AsyncTextSessionTests(TestCase):
+    RESULT = {
+        "original_text": "good food",
+        "analysis": [{"aspect": "food", "sentiment": "Positive", "confidence": 0.9}],
+    }
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username="async")
+        token = AccessToken.for_user(self.user)
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self.url = reverse("async_text_session")
+
+    async def post(self, body, headers=None):
+        return await self.async_client.post(
+            self.url,
+            body if isinstance(body, str) else json.dumps(body),
+            content_type="application/json",
+            headers=self.auth if headers is None else headers,
+        )
+
+    async def test_requires_a_valid_token(self) -> None:
+        response = await self.post({"text": "good food"}, headers={})
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.post(
+            {"text": "good food"}, headers={"Authorization": "Bearer not-a-token"}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(await AnalysisSession.objects.aexists())
+
+    async def test_rejects_a_bad_body(self) -> None:
+        for body in ("not json", {"text": 42}, ["good food"]):
+            response = await self.post(body)
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(await AnalysisSession.objects.aexists())
+
+    async def test_saves_the_record(self) -> None:
+        with mock.patch.object(
+            ABSAService, "analyze_sentiment_async", return_value=self.RESULT
+        ):
+            response = await self.post({"text": "good food"})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["status"], "Completed")
+        record = await AnalysisRecord.objects.select_related("session").aget()
+        self.assertEqual(
+            (record.original_text, record.session.user_id),
+            ("good food", self.user.id),
+        )
+        self.assertEqual(await record.results.acount(), 1)
+
+    async def test_full_queue_is_retryable(self) -> None:
+        with mock.patch.object(
+            ABSAService,
+            "analyze_sentiment_async",
+            side_effect=QueueFullError("Inference queue is full, try again later."),
+        ):
+            response = await self.post({"text": "good food"})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        session = await AnalysisSession.objects.aget()
+        self.assertEqual(session.status, "Failed")
+
+    async def test_failure_is_logged_not_leaked(self) -> None:
+        with (
+            mock.patch.object(
+                ABSAService,
+                "analyze_sentiment_async",
+                side_effect=RuntimeError("secret connection string"),
+            ),
+            self.assertLogs("analyzer.views", "ERROR"),
+        ):
+            response = await self.post({"text": "good food"})
+
+        self.assertEqual(response.json()["status"], "Failed")
+        self.assertNotIn(b"secret", response.content)
+        session = await AnalysisSession.objects.aget()
+        self.assertEqual(session.status, "Failed")
+
+
+@override_settings(ABSA_EXPORT={"CHUNK_SIZE": 4})
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.user = User.objects.create_user(username="exporter")
+        cls.session = AnalysisSession.objects.create(
+            user=cls.user, session_type="FILE", status="Completed"
+        )
+        cls.empty_session = AnalysisSession.objects.create(
+            user=cls.user, session_type="FILE", status="Completed"
+        )
+        records = AnalysisRecord.objects.bulk_create(
+            AnalysisRecord(
+                session=cls.session,
+                user=cls.user,
+                original_text=f'review {i}, "quoted"\nline é' if i % 3 else "",
+                source_row=i,
+            )
+            for i in range(7)
+        )
+        # record 0 and 5 have no results, the others one or two
+        AspectResult.objects.bulk_create(
+            AspectResult(
+                record=record,
+                aspect=f"aspect {j}",
+                sentiment="Positive",
+                confidence=0.25 * (j + 1),
+            )
+            for i, record in enumerate(records)
+            if i not in (0, 5)
+            for j in range(1 + i % 2)
+        )
+        cls.records = records
+
+    def setUp(self) -> None:
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, session, export_format) -> bytes:
+        url = reverse("session-export", args=[session.id, export_format])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def expected_rows(self) -> list:
+        rows = []
+        for record in self.records:
+            results = list(record.results.order_by("id"))
+            for result in results or [None]:
+                rows.append(
+                    [
+                        record.id,
+                        record.source_row,
+                        record.original_text,
+                        result and result.aspect,
+                        result and result.sentiment,
+                        result and result.confidence,
+                    ]
+                )
+        return rows
+
+    def test_csv(self) -> None:
+        rows = list(csv.reader(io.StringIO(self.export(self.session, "csv").decode())))
+
+        self.assertEqual(rows[0], EXPORT_COLUMNS)
+        self.assertEqual(
+            rows[1:],
+            [
+                ["" if value is None else str(value) for value in row]
+                for row in self.expected_rows()
+            ],
+        )
+
+    async def test_csv_streams_asynchronously_under_asgi(self) -> None:
+        url = reverse("session-export", args=[self.session.id, "csv"])
+        token = AccessToken.for_user(self.user)
+        response = await self.async_client.get(
+            url, headers={"Authorization": f"Bearer {token}"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 2)  # header, then one per CHUNK_SIZE rows
+
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+        expected = await sync_to_async(self.expected_rows)()
+        self.assertEqual(
+            rows[1:],
+            [["" if value is None else str(value) for value in row] for row in expected],
+        )
+
+    def test_csv_of_an_empty_session_is_the_header(self) -> None:
+        self.assertEqual(
+            self.export(self.empty_session, "csv").decode(),
+            ",".join(EXPORT_COLUMNS) + "\r\n",
+        )
+
+    def test_ndjson(self) -> None:
+        lines = self.export(self.session, "ndjson").decode().splitlines()
+
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {
+                    "id": record.id,
+                    "source_row": record.source_row,
+                    "original_text": record.original_text,
+                    "results": [
+                        {
+                            "aspect": result.aspect,
+                            "sentiment": result.sentiment,
+                            "confidence": result.confidence,
+                        }
+                        for result in record.results.order_by("id")
+                    ],
+                }
+                for record in self.records
+            ],
+        )
+        self.assertEqual(json.loads(lines[0])["results"], [])
+
+    def test_ndjson_of_an_empty_session_is_empty(self) -> None:
+        self.assertEqual(self.export(self.empty_session, "ndjson"), b"")
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet(self) -> None:
+        import pyarrow.parquet as pq
+
+        data = self.export(self.session, "parquet")
+        table = pq.read_table(io.BytesIO(data))
+
+        self.assertEqual(table.column_names, EXPORT_COLUMNS)
+        self.assertEqual(
+            [list(row.values()) for row in table.to_pylist()], self.expected_rows()
+        )
+        self.assertGreater(pq.ParquetFile(io.BytesIO(data)).num_row_groups, 1)
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_parquet_of_an_empty_session(self) -> None:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(self.export(self.empty_session, "parquet")))
+
+        self.assertEqual((table.column_names, table.num_rows), (EXPORT_COLUMNS, 0))
+
+    def test_parquet_without_pyarrow_is_not_implemented(self) -> None:
+        url = reverse("session-export", args=[self.session.id, "parquet"])
+        with mock.patch.dict("sys.modules", {"pyarrow": None}):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 501)
+
+
+PROFILE_ALL = {"ENABLED": True, "SAMPLE_RATE": 1.0, "SERVER_TIMING": True}
+
+
+@override_settings(ABSA_PROFILING=PROFILE_ALL)
+class ProfilingTests(TestCase):
+    def setUp(self) -> None:
+        self.profiler = StageProfiler(buckets=(0.01, 0.1))
+        patcher = mock.patch("analyzer.profiling.get_profiler", lambda: self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prometheus_histograms(self) -> None:
+        self.profiler.observe("request", {"clean": 0.005, "total": 0.05})
+        self.profiler.observe("request", {"total": 0.5})
+
+        self.assertEqual(
+            render_metrics().splitlines()[2:],
+            [
+                'absa_stage_duration_seconds_bucket{scope="request",stage="clean",le="0.01"} 1',
+                'absa_stage_duration_seconds_bucket{scope="request",stage="clean",le="0.1"} 1',
+                'absa_stage_duration_seconds_bucket{scope="request",stage="clean",le="+Inf"} 1',
+                'absa_stage_duration_seconds_sum{scope="request",stage="clean"} 0.005000',
+                'absa_stage_duration_seconds_count{scope="request",stage="clean"} 1',
+                'absa_stage_duration_seconds_bucket{scope="request",stage="total",le="0.01"} 0',
+                'absa_stage_duration_seconds_bucket{scope="request",stage="total",le="0.1"} 1',
+                'absa_stage_duration_seconds_bucket{scope="request",stage="total",le="+Inf"} 2',
+                'absa_stage_duration_seconds_sum{scope="request",stage="total"} 0.550000',
+                'absa_stage_duration_seconds_count{scope="request",stage="total"} 2',
+            ],
+        )
+        self.assertEqual(
+            render_metrics().splitlines()[1],
+            "# TYPE absa_stage_duration_seconds histogram",
+        )
+
+    def test_sampling(self) -> None:
+        for config, sampled in (
+            (PROFILE_ALL, True),
+            ({**PROFILE_ALL, "SAMPLE_RATE": 0.0}, False),
+            ({**PROFILE_ALL, "ENABLED": False}, False),
+        ):
+            with override_settings(ABSA_PROFILING=config):
+                with trace("bulk") as current:
+                    with stage("parse"):
+                        pass
+                self.assertEqual(current is not None, sampled)
+
+        self.assertEqual(
+            sorted(self.profiler.snapshot()), [("bulk", "parse"), ("bulk", "total")]
+        )
+
+    def test_server_timing_header(self) -> None:
+        user = User.objects.create_user(username="timed")
+        self.client.force_login(user)
+        url = reverse("session-list")
+
+        header = self.client.get(url).headers["Server-Timing"]
+        self.assertRegex(header, r"^total;dur=\d+\.\d{2}$")
+
+        with override_settings(ABSA_PROFILING={**PROFILE_ALL, "SERVER_TIMING": False}):
+            self.assertNotIn("Server-Timing", self.client.get(url).headers)
+        self.assertNotIn("Server-Timing", self.client.get("/healthz").headers)
+
+    def test_batch_stages_reach_every_request(self) -> None:
+        def handler(pairs, max_batch_size):
+            with stage("forward"):
+                return [[0.0] for _ in pairs]
+
+        # one batch of all three requests, flushed once the third is queued
+        scheduler = BatchScheduler(handler, max_batch_size=3, max_wait_ms=5000)
+        untraced = scheduler.submit([("c", "x")])
+        with trace("request") as first:
+            first_future = scheduler.submit([("a", "x")])
+            with trace("request") as second:
+                scheduler.submit([("b", "x")]).result(timeout=5)
+            first_future.result(timeout=5)
+        untraced.result(timeout=5)
+
+        self.assertEqual(scheduler.stats()["batches"], 1)
+        self.assertIn("forward", second.stages)
+        self.assertEqual(first.stages["forward"], second.stages["forward"])
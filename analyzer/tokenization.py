@@ -0,0 +1,69 @@
+from django.conf import settings
+
+import re
+
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def encode_pairs(tokenizer, pairs, max_length=None, mode=None) -> dict:
+    # Tokenizes (text, aspect) pairs without padding (batches are padded to
+    # their own longest member by pad_features). Pairs longer than max_length
+    # are either truncated or, in "window" mode, re-encoded with only the
+    # sentences around the aspect so the mention is not cut off.
+    if max_length is None:
+        max_length = getattr(settings, "ABSA_MAX_SEQ_LENGTH", 128)
+    if mode is None:
+        mode = getattr(settings, "ABSA_LONG_TEXT_MODE", "window")
+
+    texts = [text for text, _ in pairs]
+    aspects = [aspect for _, aspect in pairs]
+
+    if mode == "window":
+        # every wordpiece covers at least one character, so only pairs with
+        # more characters than max_length can overflow; measure just those
+        candidates = [
+            idx
+            for idx, (text, aspect) in enumerate(pairs)
+            if len(text) + len(aspect) + 3 > max_length
+        ]
+        if candidates:
+            full = tokenizer(
+                [texts[idx] for idx in candidates],
+                [aspects[idx] for idx in candidates],
+                truncation=False,
+                verbose=False,
+            )
+            window = getattr(settings, "ABSA_SENTENCE_WINDOW", 1)
+            for idx, input_ids in zip(candidates, full["input_ids"]):
+                if len(input_ids) > max_length:
+                    texts[idx] = aspect_window(texts[idx], aspects[idx], window)
+
+    encodings = tokenizer(texts, aspects, truncation=True, max_length=max_length)
+    return {key: encodings[key] for key in encodings.keys()}
+
+
+def pad_features(tokenizer, encodings, indices):
+    features = [
+        {key: values[idx] for key, values in encodings.items()} for idx in indices
+    ]
+    return tokenizer.pad(features, return_tensors="pt")
+
+
+def aspect_window(text, aspect, window=1) -> str:
+    # keep the sentences that mention the aspect plus `window` sentences on
+    # each side, falling back to the whole text when it is never mentioned
+    sentences = SENTENCE_BOUNDARY.split(text)
+    needle = aspect.lower()
+    mentions = [
+        idx for idx, sentence in enumerate(sentences) if needle in sentence.lower()
+    ]
+    if not mentions:
+        return text
+
+    keep = set()
+    for idx in mentions:
+        start = max(0, idx - window)
+        end = min(len(sentences), idx + window + 1)
+        keep.update(range(start, end))
+    return " ".join(sentences[idx] for idx in sorted(keep))
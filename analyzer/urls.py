@@ -5,7 +5,12 @@ from rest_framework_simplejwt.views import (
 )
 from rest_framework.routers import DefaultRouter
 
-from .views import AnalysisSessionViewSet, RegisterView
+from .views import (
+    AnalysisSessionViewSet,
+    InferenceStatsView,
+    RegisterView,
+    analyze_text_async,
+)
 
 # create router
 router = DefaultRouter()
@@ -17,6 +22,10 @@ urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
     path("login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    # Inference cache stats (admin only)
+    path("inference/stats/", InferenceStatsView.as_view(), name="inference_stats"),
+    # Async text analysis (ASGI)
+    path("async/sessions/", analyze_text_async, name="async_text_session"),
     # Unified API (handle actions for files and text)
     path("", include(router.urls)),
 ]
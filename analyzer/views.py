@@ -1,22 +1,51 @@
+from asgiref.sync import sync_to_async
 from typing import NoReturn
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models.manager import BaseManager
 from django.contrib.auth.models import User
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from django.db import transaction
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
 from rest_framework import status, generics, viewsets
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.pagination import CursorPagination
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
+import json
+import logging
 
-from .models import AspectResult, AnalysisSession, AnalysisRecord
+from .batching import QueueFullError
+from .benchmarking import process_memory
+from .cache import cache_stats
+from .engine import BulkInferenceEngine
+from .export import export_response
+from .models import AspectResult, AnalysisSession
 from .serializers import (
-    AnalysisRecordSerializer,
     UserRegistrationSerializer,
     SessionDetailSerializer,
+    SessionProgressSerializer,
     AnalysisSessionSerializer,
+    serialize_records,
 )
+from .persistence import save_analysis_results
+from .profiling import render_metrics, stage
+from .progress import apply_cached_progress, cached_progress, session_from_progress
+from .registry import registry
 from .services import ABSAService
-from .tasks import process_bulk_file
+from .tasks import process_bulk_file, process_text_batch
+
+
+logger = logging.getLogger(__name__)
 
 
 # Create your views here.
@@ -26,10 +55,64 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
 
 
-class BulkResultPagination(PageNumberPagination):
+class InferenceStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request) -> Response:
+        # model load times, memory and counters of this process' inference
+        # caches and batching scheduler
+        scheduler = ABSAService.get_scheduler()
+        try:
+            memory = process_memory()
+        except OSError:
+            memory = None  # no /proc (not Linux)
+
+        return Response(
+            {
+                "models": registry.status(),
+                "memory": memory,
+                **cache_stats(),
+                "batching": scheduler.stats() if scheduler else None,
+            }
+        )
+
+
+def healthz(request) -> JsonResponse:
+    # liveness: the process answers, whether or not the models are loaded
+    return JsonResponse({"status": "ok"})
+
+
+def readyz(request) -> JsonResponse:
+    # readiness: 200 once the AI models are loaded, 503 until then
+    if not registry.ready:
+        registry.start()  # no-op while loading, retries after a failure
+    return JsonResponse(registry.status(), status=200 if registry.ready else 503)
+
+
+def metrics(request) -> HttpResponse:
+    # stage histograms for Prometheus, see ABSA_PROFILING
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    # exports answer with their own content type whatever the Accept header
+    # asks for; errors are rendered by the first renderer (JSON)
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class BulkResultPagination(CursorPagination):
+    # keyset pagination (WHERE id > cursor), deep pages cost the same as the
+    # first one instead of scanning an ever larger OFFSET
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
+    ordering = "id"
 
 
 class AnalysisSessionViewSet(viewsets.ModelViewSet):
@@ -65,6 +148,62 @@ class AnalysisSessionViewSet(viewsets.ModelViewSet):
             serializer = AnalysisSessionSerializer(session)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+        elif "texts" in request.data:
+            texts = request.data["texts"]
+            config = getattr(settings, "ABSA_TEXT_BATCH", {})
+            max_texts = config.get("MAX_TEXTS", 5000)
+            max_text_chars = config.get("MAX_TEXT_CHARS", 2000)
+
+            if (
+                not isinstance(texts, list)
+                or not texts
+                or not all(isinstance(text, str) for text in texts)
+            ):
+                return Response(
+                    {"error": "'texts' must be a JSON list of strings."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if len(texts) > max_texts:
+                return Response(
+                    {"error": f"At most {max_texts} texts per batch."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if any(len(text) > max_text_chars for text in texts):
+                return Response(
+                    {
+                        "error": f"Texts of a batch are at most {max_text_chars} "
+                        "characters, upload longer ones as a CSV file."
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            session = AnalysisSession.objects.create(
+                user=request.user,
+                session_type="BATCH",
+                status="Pending",
+                total_items=len(texts),
+                total_rows=len(texts),
+            )
+
+            # small batches are answered right away, larger ones go to
+            # Celery with the texts in the task message (no file written)
+            if len(texts) <= config.get("SYNC_MAX_TEXTS", 32):
+                try:
+                    results = self._process_batch_sync(session, texts)
+                except Exception:
+                    return Response(
+                        {"error": "Analysis of the batch failed."},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    )
+                data = AnalysisSessionSerializer(session).data
+                data["results"] = results
+                return Response(data, status=status.HTTP_201_CREATED)
+
+            process_text_batch.delay(session.id, texts)
+
+            serializer = AnalysisSessionSerializer(session)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
         elif "text" in request.data:
             text = request.data["text"]
 
@@ -76,7 +215,14 @@ class AnalysisSessionViewSet(viewsets.ModelViewSet):
                 total_items=1,
             )
 
-            self._process_text_snc(session, text)
+            try:
+                self._process_text_snc(session, text)
+            except QueueFullError as e:
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": "1"},
+                )
 
             serializer = AnalysisSessionSerializer(session)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -84,59 +230,180 @@ class AnalysisSessionViewSet(viewsets.ModelViewSet):
         else:
             return Response(
                 {
-                    "error": "Please provide either 'csv_file' (file) or 'text' (string)."
+                    "error": "Please provide 'csv_file' (file), 'text' (string) or "
+                    "'texts' (list of strings)."
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
     def retrieve(self, request, *args, **kwargs) -> NoReturn:
-        session = self.get_object()
+        session = apply_cached_progress(self.get_object())
 
         # get session records
-        records = session.records.all().order_by("id")
+        records = session.records.values("id", "source_row", "original_text")
 
         # paginate records
         paginator = BulkResultPagination()
-        paginated_records = paginator.paginate_queryset(records, request)
+        if session.shards_dispatched:
+            # shard workers insert concurrently, so ids interleave the shards;
+            # csv order is the source row (set on every sharded record)
+            paginator.ordering = ("source_row", "id")
+        paginated_records = paginator.paginate_queryset(records, request, view=self)
 
-        # serialize records
-        record_serializer = AnalysisRecordSerializer(paginated_records, many=True)
+        # aspects of the whole page in one query
+        aspects = (
+            AspectResult.objects.filter(
+                record_id__in=[record["id"] for record in paginated_records]
+            )
+            .order_by("record_id", "id")
+            .values_list("record_id", "aspect", "sentiment", "confidence")
+        )
 
         # serialize session data
         session_data = SessionDetailSerializer(session).data
-        session_data["records"] = record_serializer.data
+        session_data["records"] = serialize_records(paginated_records, aspects)
 
         return paginator.get_paginated_response(session_data)
 
+    @action(detail=True, methods=["get"])
+    def progress(self, request, pk=None) -> Response:
+        # cheap polling: served from the progress cache while the job runs,
+        # the session row is only read when there is no live counter
+        snapshot = cached_progress(pk)
+        if snapshot is not None and snapshot["user_id"] == request.user.id:
+            session = session_from_progress(int(pk), snapshot)
+        else:
+            session = apply_cached_progress(self.get_object())
+
+        return Response(SessionProgressSerializer(session).data)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"export/(?P<export_format>csv|ndjson|parquet)",
+        content_negotiation_class=IgnoreClientContentNegotiation,
+    )
+    def export(self, request, pk=None, export_format=None):
+        # the whole session as a file, streamed without serializers (the
+        # format is a path segment: DRF reserves the "format" query param)
+        session = self.get_object()
+        try:
+            return export_response(
+                session,
+                export_format,
+                asynchronous=isinstance(request._request, ASGIRequest),
+            )
+        except ImproperlyConfigured as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+
     # --- Helper Method --- #
+    def _process_batch_sync(self, session: AnalysisSession, texts: list) -> list:
+        # the texts share batched forward passes (BulkInferenceEngine), the
+        # results are saved and returned in the order given. The records and
+        # the Completed status are committed together; on failure the session
+        # is left Failed without records and the error is raised again.
+        session.started_at = timezone.now()
+        try:
+            results = BulkInferenceEngine().analyze(texts)
+
+            with stage("db_write"), transaction.atomic():
+                save_analysis_results(
+                    session, results, source_rows=list(range(len(texts)))
+                )
+
+                session.status = "Completed"
+                session.processed_rows = len(texts)
+                session.finished_at = timezone.now()
+                session.save()
+
+        except Exception:
+            logger.exception("Analysis of batch session %s failed", session.id)
+            session.status = "Failed"
+            session.processed_rows = 0
+            session.finished_at = timezone.now()
+            session.save()
+            raise
+
+        return results
+
     def _process_text_snc(self, session: AnalysisSession, text: str) -> None:
         try:
             # run AI logic
             ai_result = ABSAService.analyze_sentiment(text)
 
-            # create record linked to session
-            record = AnalysisRecord.objects.create(
-                session=session,
-                user=session.user,
-                original_text=text,
-            )
+            # create record and aspects linked to session
+            with stage("db_write"):
+                save_analysis_results(session, [ai_result])
 
-            # create aspects
-            aspects = [
-                AspectResult(
-                    record=record,
-                    aspect=item["aspect"],
-                    sentiment=item["sentiment"],
-                    confidence=item["confidence"],
-                )
-                for item in ai_result["analysis"]
-            ]
-            AspectResult.objects.bulk_create(aspects)
+                # update session status
+                session.status = "Completed"
+                session.save()
 
-            # update session status
-            session.status = "Completed"
+        except QueueFullError:
+            # overloaded, let the caller answer with a retryable error
+            session.status = "Failed"
             session.save()
+            raise
 
-        except Exception as e:
-            session.status = f"Failed: {str(e)}"
+        except Exception:
+            logger.exception("Analysis of text session %s failed", session.id)
+            session.status = "Failed"
             session.save()
+
+
+# --- Async (ASGI) text endpoint --- #
+@csrf_exempt
+@require_POST
+async def analyze_text_async(request) -> JsonResponse:
+    # Same contract as POST /api/sessions/ with "text", but inference and DB
+    # writes are awaited instead of holding a thread for the whole request.
+    # Only JWT bearer auth is accepted (no session cookie, so no CSRF).
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+        return JsonResponse(detail, status=401)
+    if auth is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401
+        )
+    user = auth[0]
+
+    try:
+        text = json.loads(request.body or b"{}").get("text")
+    except (ValueError, AttributeError):
+        text = None
+    if not isinstance(text, str):
+        return JsonResponse({"error": "Please provide 'text' (string)."}, status=400)
+
+    session = await AnalysisSession.objects.acreate(
+        user=user,
+        session_type="TEXT",
+        raw_input_text=text,
+        status="Pending",
+        total_items=1,
+    )
+
+    try:
+        # run AI logic
+        ai_result = await ABSAService.analyze_sentiment_async(text)
+
+        # create record and aspects linked to session
+        with stage("db_write"):
+            await sync_to_async(save_analysis_results)(session, [ai_result])
+
+        session.status = "Completed"
+
+    except QueueFullError as e:
+        session.status = "Failed"
+        await session.asave()
+        return JsonResponse({"error": str(e)}, status=503, headers={"Retry-After": "1"})
+
+    except Exception:
+        logger.exception("Analysis of text session %s failed", session.id)
+        session.status = "Failed"
+
+    await session.asave()
+    return JsonResponse(AnalysisSessionSerializer(session).data, status=201)